@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+模拟器性能基准
+
+在固定场景（小规模、默认、30 天、高请求率突发、激进缩容）和固定种子下运行
+TaskWarmPoolSimulator（simulate-capacity.py）与 WarmPoolSimulator
+（simulate-multi-user.py），记录事件数、墙钟时间、事件/秒和峰值 RSS。
+每个场景在独立的子进程中运行，峰值 RSS 不受其他场景影响；墙钟时间取
+多次运行的最小值以降低噪声。
+
+基线文件为 JSON，与机器相关，应在同一台机器上保存与对比。对比模式下
+事件/秒下降或峰值内存上升超过阈值即判为回退，退出码为 1（可用于夜间任务）；
+事件数变化说明模拟行为变了，单独提示。
+
+使用方法:
+    python3 benchmark-simulators.py                    # 运行全部场景
+    python3 benchmark-simulators.py --save             # 运行并保存基线
+    python3 benchmark-simulators.py --compare          # 与基线对比，回退时退出码为 1
+    python3 benchmark-simulators.py --compare --threshold 0.1 --only capacity
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, 'benchmark-baseline.json')
+SEED = 42
+
+# 场景名 -> (模拟时长（小时）, 请求率（每分钟）, 缩容阈值)；None 表示使用模拟器默认值
+# scale-down 用激进阈值覆盖实例排空路径（排空与启动中的 Task 交错）
+SCENARIOS = {
+    'small': (1, None, None),
+    'default': (8, None, None),
+    '30day': (720, None, None),
+    'burst': (1, 500, None),
+    'scale-down': (8, None, 0.9),
+}
+SIMULATORS = ['capacity', 'multi-user']
+
+
+def load_script(name: str):
+    """按文件名加载带连字符的模拟器脚本"""
+    path = os.path.join(SCRIPT_DIR, f'simulate-{name}.py')
+    spec = importlib.util.spec_from_file_location(f"simulate_{name.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, SCRIPT_DIR)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_simulator(module, simulator: str, hours: float, rate: Optional[float],
+                    scale_down: Optional[float] = None):
+    """按场景构造模拟器实例（种子固定）"""
+    if simulator == 'capacity':
+        config = module.SimConfig(simulation_hours=hours)
+        if rate is not None:
+            config.request_rate = rate
+        if scale_down is not None:
+            # 预热 Task 多时排空最容易撞上启动中的预热 Task
+            config.scale_down_threshold = scale_down
+            config.warm_tasks = 5
+        module.random.seed(SEED)
+        return module.TaskWarmPoolSimulator(config)
+
+    config = module.get_strategy_config('hybrid')
+    config.duration_hours = hours
+    if rate is not None:
+        config.request_rate = rate
+    if scale_down is not None:
+        config.scale_down_threshold = scale_down
+    return module.WarmPoolSimulator(config, rng=module.RandomStreams(SEED))
+
+
+def run_scenario(simulator: str, scenario: str, repeat: int) -> Dict:
+    """在当前（子）进程中运行一个场景 repeat 次"""
+    from sim_profile import peak_rss_mb
+
+    hours, rate, scale_down = SCENARIOS[scenario]
+    module = load_script(simulator)
+    walls = []
+    events = 0
+    for _ in range(repeat):
+        sim = build_simulator(module, simulator, hours, rate, scale_down)
+        started = time.perf_counter()
+        sim.run()
+        walls.append(time.perf_counter() - started)
+        events = sim.events_processed
+    wall = min(walls)
+    return {
+        'events': events,
+        'wall_seconds': wall,
+        'events_per_second': events / wall,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_suite(only: Optional[str], repeat: int) -> Dict[str, Dict]:
+    """逐个场景在新的子进程中运行（spawn，避免继承父进程内存）"""
+    results = {}
+    context = get_context('spawn')
+    for simulator in SIMULATORS:
+        for scenario in SCENARIOS:
+            name = f'{simulator}/{scenario}'
+            if only and only not in name:
+                continue
+            print(f"  {name}...", end='', flush=True)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                results[name] = pool.submit(run_scenario, simulator, scenario, repeat).result()
+            print(f" {results[name]['wall_seconds']:.2f}s")
+    return results
+
+
+def print_table(results: Dict[str, Dict]):
+    """打印基准结果"""
+    print()
+    print(f"{'场景':<24} {'事件数':>12} {'耗时':>10} {'事件/秒':>12} {'峰值RSS':>10}")
+    print("-" * 72)
+    for name, row in results.items():
+        rss = row['peak_rss_mb']
+        print(f"{name:<24} {row['events']:>12} {row['wall_seconds']:>9.3f}s "
+              f"{row['events_per_second']:>12,.0f} " + (f"{rss:>8.1f}MB" if rss is not None else f"{'-':>10}"))
+    print("-" * 72)
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """与基线对比，返回回退描述列表（打印对比表格）"""
+    regressions = []
+    print()
+    print(f"{'场景':<24} {'事件/秒 (基线 → 当前)':>34} {'变化':>8} {'峰值RSS变化':>12}")
+    print("-" * 84)
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<24} {'(基线中无此场景)':>34}")
+            continue
+        speed = row['events_per_second'] / base['events_per_second'] - 1
+        memory = None
+        if row['peak_rss_mb'] is not None and base.get('peak_rss_mb'):
+            memory = row['peak_rss_mb'] / base['peak_rss_mb'] - 1
+        flags = []
+        if speed < -threshold:
+            flags.append('速度回退')
+            regressions.append(f"{name}: 事件/秒下降 {-speed * 100:.1f}%")
+        if memory is not None and memory > threshold:
+            flags.append('内存回退')
+            regressions.append(f"{name}: 峰值 RSS 上升 {memory * 100:.1f}%")
+        if row['events'] != base['events']:
+            flags.append(f"事件数 {base['events']} → {row['events']}")
+        print(f"{name:<24} {base['events_per_second']:>15,.0f} → {row['events_per_second']:<15,.0f} "
+              f"{speed * 100:>+7.1f}% " + (f"{memory * 100:>+11.1f}%" if memory is not None else f"{'-':>12}")
+              + (f"  ⚠ {', '.join(flags)}" if flags else ''))
+    print("-" * 84)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模拟器性能基准')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help=f'基线文件路径 (默认: {os.path.basename(DEFAULT_BASELINE)})')
+    parser.add_argument('--save', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--compare', action='store_true', help='与基线对比，回退时退出码为 1')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='回退阈值：事件/秒下降或峰值 RSS 上升超过该比例 (默认: 0.2)')
+    parser.add_argument('--repeat', type=int, default=3, help='每个场景的运行次数，耗时取最小值 (默认: 3)')
+    parser.add_argument('--only', help='只运行名称包含该字符串的场景，如 capacity 或 30day')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"错误: 基线文件不存在: {args.baseline}（先用 --save 生成）", file=sys.stderr)
+            sys.exit(1)
+
+    print(f"模拟器性能基准 (种子 {SEED}, 每场景 {args.repeat} 次取最快)")
+    results = run_suite(args.only, args.repeat)
+    print_table(results)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'seed': SEED,
+                'repeat': args.repeat,
+                'scenarios': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存到 {args.baseline}")
+
+    if baseline is not None:
+        print(f"\n对比基线 {args.baseline} ({baseline['created']}, Python {baseline['python']}), "
+              f"阈值 {args.threshold * 100:g}%")
+        regressions = compare(results, baseline['scenarios'], args.threshold)
+        if regressions:
+            print("\n性能回退:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n未发现性能回退")
+
+
+if __name__ == '__main__':
+    main()
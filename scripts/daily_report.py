@@ -12,16 +12,44 @@ AI Shell 日报脚本
   python3 daily_report.py --range 7d         # 最近 7 天
   python3 daily_report.py --format json      # JSON 输出
   python3 daily_report.py --compare 2026-02-07  # 与指定日期对比
+  python3 daily_report.py --range 14d --export-trace sessions.jsonl  # 导出会话到达轨迹
+  python3 daily_report.py --max-concurrent 5    # 限制同时运行的 Insights 查询数
+  python3 daily_report.py --range 7d --deadline 900  # 大范围查询放宽截止时间
+  python3 daily_report.py --query-plan separate  # 每个章节单独查询（与合并计划对照）
+  python3 daily_report.py --date 2026-02-08 --no-cache  # 不使用按天结果缓存
+  python3 daily_report.py --range 30d --export-metrics  # 导出原始耗时样本到本地（需要 numpy）
+  python3 daily_report.py --range 7d --metrics --hourly  # 本地计算分位数与按小时分桶
+
+所有查询（含 --compare 的对比日期、--export-trace 的各天）一次性提交，
+在并发上限内同时运行，由一个轮询循环统一收取结果，总耗时约等于最慢的
+查询；每个查询的耗时与扫描字节数输出到 stderr。到 --deadline 仍未完成的
+查询在 Markdown 中标记为"查询超时"，JSON 中结果为 null 并列在 incomplete 中，
+不会被当成没有数据。
+
+已结束的 UTC 整天（--date、--compare、--export-trace 的中间各天）的查询结果
+按 环境 / 日期 / 查询语句哈希 永久缓存在本地，重新生成不再查询 Insights；
+当天的部分结果从不缓存。--range 的起点不是 0 点，不走缓存。
+
+--export-metrics 把已结束各天的原始 duration_ms 按 phase 存成本地 .npy 分区
+（见 metric_store.py），--metrics 用 NumPy 在本地计算任意范围的分位数，
+跨天的分位数不必再扫描日志。
 """
 
 import argparse
+import hashlib
 import json
+import os
+import random
 import sys
 import time
+from collections import defaultdict, deque
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Hashable
 
 import boto3
+from botocore.exceptions import ClientError
+
+from metric_store import HAS_NUMPY, PERCENTILES, MetricStore, hourly, merge_samples, rows_to_samples, summarize
 
 # 日志组映射（session-gateway 有独立的日志组）
 LOG_GROUPS = {
@@ -119,34 +147,344 @@ fields @timestamp, userId, userEmail, sessionId
 }
 
 
-def run_query(client: Any, log_group: str, query: str, start: int, end: int) -> list[dict]:
-    """执行 CloudWatch Logs Insights 查询并返回结果"""
-    response = client.start_query(
-        logGroupName=log_group,
-        startTime=start,
-        endTime=end,
-        queryString=query.strip(),
-    )
-    query_id = response["queryId"]
-
-    # 轮询等待结果
-    for _ in range(60):
-        result = client.get_query_results(queryId=query_id)
-        if result["status"] == "Complete":
-            # 转换结果格式
-            rows = []
-            for row in result.get("results", []):
-                entry = {}
-                for field in row:
-                    if field["field"] != "@ptr":
-                        entry[field["field"]] = field["value"]
-                rows.append(entry)
-            return rows
-        if result["status"] == "Failed":
-            return []
-        time.sleep(1)
-
-    return []
+# task_lifecycle 合并查询计划：QUERIES 中 7 个章节都过滤 event = "task_lifecycle"，
+# 各自扫描一遍日志组（Insights 按扫描字节计费和限流）。合并后两次扫描按 phase
+# 分组，再由 split_lifecycle 拆回原来的章节:
+#   lifecycle_durations  计数 + 耗时分布（分位数按 phase 各自计算）
+#   lifecycle_details    restart 按 success、ws_disconnect 按 processingState 细分
+LIFECYCLE_QUERIES = {
+    "lifecycle_durations": """
+fields @timestamp, phase, duration_ms
+| filter event = "task_lifecycle"
+    and phase in ["session_create", "task_ready", "task_start", "task_pending", "task_connect",
+                  "message_roundtrip", "idle_timeout"]
+| stats count() as total,
+        avg(duration_ms) as avg_ms,
+        pct(duration_ms, 50) as p50,
+        pct(duration_ms, 90) as p90,
+        pct(duration_ms, 99) as p99,
+        max(duration_ms) as max_ms
+  by phase
+""",
+
+    "lifecycle_details": """
+fields @timestamp, phase, duration_ms, coalesce(success, processingState) as detail
+| filter event = "task_lifecycle"
+    and (phase = "ws_disconnect" or (phase = "restart" and ispresent(success)))
+| stats count() as total,
+        avg(duration_ms) as avg_ms
+  by phase, detail
+""",
+}
+
+# 合并计划中由 LIFECYCLE_QUERIES 拆出的章节 -> 来源查询
+LIFECYCLE_SECTIONS = {
+    "session_count": "lifecycle_durations",
+    "task_startup": "lifecycle_durations",
+    "task_phases": "lifecycle_durations",
+    "restart_stats": "lifecycle_details",
+    "ws_disconnects": "lifecycle_details",
+    "message_roundtrip": "lifecycle_durations",
+    "idle_timeouts": "lifecycle_durations",
+}
+QUERY_PLANS = ["consolidated", "separate"]
+
+
+def query_plan(plan: str) -> dict[str, str]:
+    """按计划返回实际执行的查询：separate 为 QUERIES 原样，consolidated 把 task_lifecycle 章节合并"""
+    if plan == "separate":
+        return QUERIES
+    queries = {name: query for name, query in QUERIES.items() if name not in LIFECYCLE_SECTIONS}
+    queries.update(LIFECYCLE_QUERIES)
+    return queries
+
+
+def split_lifecycle(durations: list[dict], details: list[dict]) -> dict[str, list[dict]]:
+    """把合并查询按 phase 分组的结果拆回 QUERIES 各章节的行格式"""
+    by_phase = {row.get("phase"): row for row in durations}
+
+    def single(phase: str, fields: tuple[str, ...]) -> list[dict]:
+        row = by_phase.get(phase)
+        return [{field: row[field] for field in fields if field in row}] if row else []
+
+    return {
+        "session_count": single("session_create", ("total",)),
+        "task_startup": single("task_ready", ("total", "avg_ms", "p50", "p90", "p99", "max_ms")),
+        "task_phases": [
+            {"phase": phase, **{field: by_phase[phase][field] for field in ("avg_ms", "p90") if field in by_phase[phase]}}
+            for phase in ("task_start", "task_pending", "task_connect") if phase in by_phase
+        ],
+        "restart_stats": [
+            {"success": row.get("detail", ""), "total": row.get("total", 0), "avg_restart_ms": row.get("avg_ms")}
+            for row in details if row.get("phase") == "restart"
+        ],
+        "ws_disconnects": [
+            {"processingState": row.get("detail", "unknown"), "total": row.get("total", 0)}
+            for row in details if row.get("phase") == "ws_disconnect"
+        ],
+        "message_roundtrip": single("message_roundtrip", ("total", "avg_ms", "p50", "p90", "max_ms")),
+        "idle_timeouts": single("idle_timeout", ("total",)),
+    }
+
+
+# 会话到达轨迹（按时间升序），供 simulate-capacity.py / simulate-multi-user.py --trace 回放
+TRACE_QUERY = """
+fields @timestamp, userId, sessionId
+| filter event = "task_lifecycle" and phase = "session_create"
+| sort @timestamp asc
+| limit 10000
+"""
+
+# 原始耗时样本（--export-metrics），按时间升序；一个窗口达到返回上限时对半切分重查
+RAW_METRICS_QUERY = """
+fields @timestamp, phase, duration_ms
+| filter event = "task_lifecycle" and ispresent(duration_ms)
+| sort @timestamp asc
+| limit 10000
+"""
+MIN_SPLIT_SECONDS = 60
+
+PHASE_LABELS = {"task_start": "RunTask API", "task_pending": "PENDING→RUNNING", "task_connect": "RUNNING→WS连接"}
+
+# Logs Insights 单次查询最多返回的行数
+INSIGHTS_MAX_ROWS = 10000
+
+# 同时运行的查询数上限（账号级上限为 30，与控制台、仪表盘共用，默认留出余量）
+DEFAULT_MAX_CONCURRENT = 10
+# 一批查询的截止时间（秒，从开始提交算起）；到期仍未完成的查询标记为超时
+DEFAULT_DEADLINE = 300.0
+# 轮询间隔：首次很快（小查询不到 1 秒就完成），之后指数退避到上限，并加随机抖动
+POLL_FIRST = 0.25
+POLL_MAX = 5.0
+# 被限流（GetQueryResults 约 5 TPS、StartQuery 并发上限）时的退避上限
+THROTTLE_MAX = 30.0
+THROTTLE_CODES = ("ThrottlingException", "LimitExceededException", "TooManyRequestsException")
+
+# 按天的查询结果缓存：已结束的 UTC 日的日志不再变化，结果永久缓存；
+# 日结束后再等 CACHE_SETTLE 秒（日志投递延迟）才写入，当天的部分结果从不缓存
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "ai-shell-daily-report")
+CACHE_SETTLE = 3600
+DAY_SECONDS = 86400
+
+QUERY_DONE = ("Complete", "Failed", "Cancelled", "Timeout")
+# 未完成查询在报告中的标记
+QUERY_STATUS_LABELS = {"Timeout": "查询超时", "Failed": "查询失败", "Cancelled": "查询被取消"}
+
+
+def parse_rows(result: dict) -> list[dict]:
+    """把 get_query_results 的结果转换为 {字段: 值} 列表（去掉 @ptr）"""
+    rows = []
+    for row in result.get("results", []):
+        entry = {}
+        for field in row:
+            if field["field"] != "@ptr":
+                entry[field["field"]] = field["value"]
+        rows.append(entry)
+    return rows
+
+
+def format_bytes(value: float) -> str:
+    """格式化字节数"""
+    if value < 1024:
+        return f"{value:.0f} B"
+    for unit in ("KB", "MB", "GB", "TB"):
+        value /= 1024
+        if value < 1024 or unit == "TB":
+            return f"{value:.1f} {unit}"
+
+
+class DayCache:
+    """单日查询结果缓存：{cache_dir}/{env}/{YYYY-MM-DD}/{查询哈希}.json
+
+    只缓存恰好覆盖一个 UTC 日（00:00 ~ 次日 00:00）、已结束超过 CACHE_SETTLE 秒
+    且成功完成的查询；查询语句变化后哈希不同，旧结果不再命中。
+    """
+
+    def __init__(self, cache_dir: str, env: str):
+        self.root = os.path.join(cache_dir, env)
+
+    @staticmethod
+    def cacheable(start: int, end: int) -> bool:
+        return start % DAY_SECONDS == 0 and end - start == DAY_SECONDS and end + CACHE_SETTLE <= time.time()
+
+    def path(self, query: str, start: int) -> str:
+        day = datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d")
+        digest = hashlib.sha256(query.strip().encode()).hexdigest()[:16]
+        return os.path.join(self.root, day, f"{digest}.json")
+
+    def get(self, query: str, start: int, end: int) -> dict | None:
+        if not self.cacheable(start, end):
+            return None
+        try:
+            with open(self.path(query, start)) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def put(self, query: str, start: int, end: int, result: dict):
+        if not self.cacheable(start, end) or result["status"] != "Complete":
+            return
+        path = self.path(query, start)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，中断时不会留下半个文件
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def is_throttled(error: ClientError) -> bool:
+    """是否为限流 / 并发上限错误（可退避重试）"""
+    return error.response.get("Error", {}).get("Code") in THROTTLE_CODES
+
+
+def jitter(delay: float) -> float:
+    """在 [delay / 2, delay] 内随机取值，避免多个查询同时轮询"""
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run_queries(
+    client: Any,
+    log_group: str,
+    queries: dict[Hashable, tuple[str, int, int]],
+    max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+    labels: dict[Hashable, str] | None = None,
+    deadline: float = DEFAULT_DEADLINE,
+    cache: DayCache | None = None,
+) -> dict[Hashable, dict]:
+    """并发执行一批 Logs Insights 查询
+
+    queries: {键: (查询语句, 开始时间戳, 结束时间戳)}。按顺序提交，同时运行的
+    查询不超过 max_concurrent；一个循环按各查询自己的轮询时间表收取结果
+    （POLL_FIRST 起指数退避到 POLL_MAX，带抖动），被限流的提交 / 轮询退避后重试，
+    其他错误只让该查询记为 Failed，不影响同批其余查询。
+    deadline 秒后仍未完成的查询被停止，未提交的不再提交，状态均为 Timeout。
+
+    返回 {键: {"rows", "status", "seconds", "bytes_scanned", "records_scanned"}}；
+    status 不是 Complete 时 rows 为空列表，调用方据此区分"没有数据"与"没查到"。
+    给出 cache 时，已结束的整天查询先查缓存（命中的 cached 为 True），完成后写入缓存。
+    """
+    labels = labels or {}
+    results: dict[Hashable, dict] = {}
+    waiting = deque()
+    for key, (query, start, end) in queries.items():
+        hit = cache.get(query, start, end) if cache is not None else None
+        if hit is None:
+            waiting.append((key, (query, start, end)))
+            continue
+        # 本次没有执行查询：耗时与扫描量记为 0
+        results[key] = dict(hit, cached=True, seconds=0.0, bytes_scanned=0.0, records_scanned=0.0)
+        print(f"  {labels.get(key, key)}: {len(hit['rows'])} 行, 缓存", file=sys.stderr)
+    # queryId -> [键, 提交时间, 当前轮询间隔, 下次轮询时间]
+    running: dict[str, list] = {}
+    started = time.monotonic()
+    deadline_at = started + deadline
+    submit_delay = 0.0
+    submit_at = started
+
+    def finish(key: Hashable, status: str, elapsed: float, result: dict | None = None):
+        statistics = (result or {}).get("statistics", {})
+        rows = parse_rows(result) if status == "Complete" else []
+        results[key] = {
+            "rows": rows,
+            "status": status,
+            "seconds": round(elapsed, 2),
+            "bytes_scanned": statistics.get("bytesScanned", 0.0),
+            "records_scanned": statistics.get("recordsScanned", 0.0),
+        }
+        if cache is not None:
+            cache.put(*queries[key], results[key])
+        note = "" if status == "Complete" else f", {QUERY_STATUS_LABELS.get(status, status)}"
+        print(f"  {labels.get(key, key)}: {len(rows)} 行, {elapsed:.1f}s, "
+              f"扫描 {format_bytes(results[key]['bytes_scanned'])}{note}", file=sys.stderr)
+
+    while waiting or running:
+        now = time.monotonic()
+        if now >= deadline_at:
+            for query_id, (key, submitted, _, _) in running.items():
+                try:
+                    client.stop_query(queryId=query_id)
+                except ClientError:
+                    pass
+                finish(key, "Timeout", now - submitted)
+            for key, _ in waiting:
+                finish(key, "Timeout", 0.0)
+            break
+
+        # 在并发上限内提交（被限流时整体退避）
+        while waiting and len(running) < max_concurrent and now >= submit_at:
+            key, (query, start, end) = waiting[0]
+            try:
+                response = client.start_query(
+                    logGroupName=log_group,
+                    startTime=start,
+                    endTime=end,
+                    queryString=query.strip(),
+                )
+            except ClientError as error:
+                if not is_throttled(error):
+                    waiting.popleft()
+                    print(f"  {labels.get(key, key)}: 提交失败: {error}", file=sys.stderr)
+                    finish(key, "Failed", 0.0)
+                    continue
+                submit_delay = min(max(submit_delay * 2, POLL_FIRST), THROTTLE_MAX)
+                submit_at = now + jitter(submit_delay)
+                break
+            submit_delay = 0.0
+            waiting.popleft()
+            running[response["queryId"]] = [key, now, POLL_FIRST, now + jitter(POLL_FIRST)]
+
+        # 睡到最早的下次轮询 / 提交 / 截止时间
+        wake = [poll[3] for poll in running.values()] + [deadline_at]
+        if waiting and len(running) < max_concurrent:
+            wake.append(submit_at)
+        time.sleep(max(0.0, min(wake) - time.monotonic()))
+
+        # 轮询到期的查询
+        now = time.monotonic()
+        for query_id, poll in list(running.items()):
+            key, submitted, delay, next_poll = poll
+            if next_poll > now:
+                continue
+            try:
+                result = client.get_query_results(queryId=query_id)
+            except ClientError as error:
+                if not is_throttled(error):
+                    del running[query_id]
+                    print(f"  {labels.get(key, key)}: 获取结果失败: {error}", file=sys.stderr)
+                    finish(key, "Failed", now - submitted)
+                    continue
+                poll[2] = min(delay * 4, THROTTLE_MAX)
+                poll[3] = now + jitter(poll[2])
+                continue
+            if result["status"] not in QUERY_DONE:
+                poll[2] = min(delay * 2, POLL_MAX)
+                poll[3] = now + jitter(poll[2])
+                continue
+            del running[query_id]
+            finish(key, result["status"], now - submitted, result)
+
+    return results
+
+
+def run_query(client: Any, log_group: str, query: str, start: int, end: int,
+              deadline: float = DEFAULT_DEADLINE) -> list[dict] | None:
+    """执行单个 CloudWatch Logs Insights 查询并返回结果；未完成（超时 / 失败）时返回 None"""
+    result = run_queries(client, log_group, {"query": (query, start, end)}, deadline=deadline)["query"]
+    return result["rows"] if result["status"] == "Complete" else None
+
+
+def print_query_summary(results: dict[Hashable, dict], wall: float):
+    """输出一批查询的墙钟时间、累计查询耗时与扫描量"""
+    total_seconds = sum(r["seconds"] for r in results.values())
+    total_bytes = sum(r["bytes_scanned"] for r in results.values())
+    incomplete = sum(1 for r in results.values() if r["status"] != "Complete")
+    cached = sum(1 for r in results.values() if r.get("cached"))
+    note = f", {cached} 个来自缓存" if cached else ""
+    note += f", {incomplete} 个未完成" if incomplete else ""
+    print(f"共 {len(results)} 个查询: 墙钟 {wall:.1f}s, 累计查询耗时 {total_seconds:.1f}s, "
+          f"扫描 {format_bytes(total_bytes)}{note}", file=sys.stderr)
 
 
 def format_ms(value: str | float | None) -> str:
@@ -162,34 +500,238 @@ def format_ms(value: str | float | None) -> str:
         return str(value)
 
 
-def generate_report(
+def generate_reports(
     env: str,
-    start_time: datetime,
-    end_time: datetime,
-    compare_data: dict | None = None,
-) -> dict:
-    """生成报告数据"""
+    windows: list[tuple[datetime, datetime]],
+    max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+    deadline: float = DEFAULT_DEADLINE,
+    plan: str = "consolidated",
+    cache: DayCache | None = None,
+) -> list[dict]:
+    """生成多个时间范围的报告数据（所有范围的查询一起并发执行）
+
+    plan 为 consolidated 时 task_lifecycle 各章节由两次合并扫描拆出（见 LIFECYCLE_QUERIES），
+    报告的章节与 separate 计划相同。未完成（超时 / 失败）的章节为 None（JSON 中为 null），
+    并列在 incomplete 中，与查询成功但没有数据的 [] 区分；query_stats 按实际执行的查询记录。
+    """
+    plan_queries = query_plan(plan)
     client = boto3.client("logs", region_name=REGION)
     log_group = LOG_GROUPS[env]
 
-    start_ts = int(start_time.timestamp())
-    end_ts = int(end_time.timestamp())
-
-    data: dict[str, Any] = {"env": env, "start": start_time.isoformat(), "end": end_time.isoformat()}
-
     print(f"查询日志组: {log_group}", file=sys.stderr)
-    print(f"时间范围: {start_time.strftime('%Y-%m-%d %H:%M')} ~ {end_time.strftime('%Y-%m-%d %H:%M')}", file=sys.stderr)
+    queries = {}
+    labels = {}
+    for index, (start_time, end_time) in enumerate(windows):
+        window = f"{start_time.strftime('%Y-%m-%d %H:%M')} ~ {end_time.strftime('%Y-%m-%d %H:%M')}"
+        print(f"时间范围: {window}", file=sys.stderr)
+        for name, query in plan_queries.items():
+            queries[index, name] = (query, int(start_time.timestamp()), int(end_time.timestamp()))
+            labels[index, name] = name if len(windows) == 1 else f"{name} [{start_time.strftime('%Y-%m-%d')}]"
+
+    started = time.monotonic()
+    results = run_queries(client, log_group, queries, max_concurrent, labels, deadline, cache)
+    print_query_summary(results, time.monotonic() - started)
+
+    reports = []
+    for index, (start_time, end_time) in enumerate(windows):
+        data: dict[str, Any] = {"env": env, "start": start_time.isoformat(), "end": end_time.isoformat()}
+        data["incomplete"] = {}
+        sections = {}
+        if plan == "consolidated":
+            sections = split_lifecycle(results[index, "lifecycle_durations"]["rows"],
+                                       results[index, "lifecycle_details"]["rows"])
+        for name in QUERIES:
+            result = results[index, LIFECYCLE_SECTIONS[name] if name in sections else name]
+            data[name] = sections.get(name, result["rows"]) if result["status"] == "Complete" else None
+            if result["status"] != "Complete":
+                data["incomplete"][name] = result["status"]
+        data["query_stats"] = {
+            name: {k: v for k, v in results[index, name].items() if k != "rows"} for name in plan_queries
+        }
+        reports.append(data)
+    return reports
+
+
+def export_trace(env: str, start_time: datetime, end_time: datetime, path: str,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT, deadline: float = DEFAULT_DEADLINE,
+                 cache: DayCache | None = None) -> int:
+    """按 UTC 日查询 session_create 事件（各天并发），以 JSONL 写入轨迹文件，返回写入条数
+
+    切分点对齐到 UTC 0 点，中间的整天可以命中按天缓存。
+    """
+    client = boto3.client("logs", region_name=REGION)
+    log_group = LOG_GROUPS[env]
 
-    for name, query in QUERIES.items():
-        print(f"  查询: {name}...", file=sys.stderr, end=" ")
-        rows = run_query(client, log_group, query, start_ts, end_ts)
-        data[name] = rows
-        print(f"({len(rows)} 行)", file=sys.stderr)
+    print(f"导出会话轨迹: {log_group} -> {path}", file=sys.stderr)
+    # 按天切分，避免单次查询超过返回行数上限
+    days = []
+    day_start = start_time
+    while day_start < end_time:
+        midnight = day_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = min(midnight + timedelta(days=1), end_time)
+        days.append((day_start, day_end))
+        day_start = day_end
+    queries = {day: (TRACE_QUERY, int(day.timestamp()), int(day_end.timestamp())) for day, day_end in days}
+    labels = {day: day.strftime("%Y-%m-%d %H:%M") for day, _ in days}
+
+    started = time.monotonic()
+    results = run_queries(client, log_group, queries, max_concurrent, labels, deadline, cache)
+    print_query_summary(results, time.monotonic() - started)
+
+    count = 0
+    with open(path, "w") as f:
+        for day, _ in days:
+            rows = results[day]["rows"]
+            if results[day]["status"] != "Complete":
+                status = results[day]["status"]
+                print(f"  {labels[day]}: {QUERY_STATUS_LABELS.get(status, status)}，该时段的会话缺失", file=sys.stderr)
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += len(rows)
+            if len(rows) >= INSIGHTS_MAX_ROWS:
+                print(f"  {labels[day]}: 达到返回上限 {INSIGHTS_MAX_ROWS} 条，可能被截断", file=sys.stderr)
+    return count
+
+
+def export_metrics(env: str, start_time: datetime, end_time: datetime, store: MetricStore,
+                   max_concurrent: int = DEFAULT_MAX_CONCURRENT, deadline: float = DEFAULT_DEADLINE) -> int:
+    """把范围内已结束的 UTC 整天的原始 duration_ms 样本导出到本地存储，返回新导出的天数
+
+    已导出的天跳过（分区不可变）。每天先整天查询，返回行数达到上限的窗口对半切分
+    后再查，直到不再截断；窗口按 [开始, 结束) 过滤样本，切分点上的事件不会重复。
+    有窗口未完成或切到 MIN_SPLIT_SECONDS 仍被截断的日子不写入。
+    """
+    client = boto3.client("logs", region_name=REGION)
+    log_group = LOG_GROUPS[env]
 
-    data["compare"] = compare_data
+    days = []
+    day = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end_time:
+        day_end = day + timedelta(days=1)
+        if day_end.timestamp() + CACHE_SETTLE > time.time():
+            print(f"  {day.strftime('%Y-%m-%d')}: 尚未结束，不导出", file=sys.stderr)
+        elif store.has(day.date()):
+            print(f"  {day.strftime('%Y-%m-%d')}: 已导出，跳过", file=sys.stderr)
+        else:
+            days.append(day)
+        day = day_end
+    print(f"导出原始耗时样本: {log_group} ({len(days)} 天)", file=sys.stderr)
+
+    windows = [(day.date(), int(day.timestamp()), int(day.timestamp()) + DAY_SECONDS) for day in days]
+    parts: dict[Any, list[dict]] = defaultdict(list)
+    failed: dict[Any, str] = {}
+    started = time.monotonic()
+    while windows:
+        labels = {
+            window: f"{window[0]} {datetime.fromtimestamp(window[1], timezone.utc).strftime('%H:%M')}"
+                    f"-{datetime.fromtimestamp(window[2], timezone.utc).strftime('%H:%M')}"
+            for window in windows
+        }
+        queries = {window: (RAW_METRICS_QUERY, window[1], window[2]) for window in windows}
+        results = run_queries(client, log_group, queries, max_concurrent, labels, deadline)
+        windows = []
+        for (day, start, end), result in results.items():
+            if result["status"] != "Complete":
+                failed[day] = QUERY_STATUS_LABELS.get(result["status"], result["status"])
+            elif len(result["rows"]) < INSIGHTS_MAX_ROWS:
+                for phase, array in rows_to_samples(result["rows"]).items():
+                    lo, hi = array["t"].searchsorted([start * 1000, end * 1000])
+                    parts[day].append((phase, array[lo:hi]))
+            elif end - start > MIN_SPLIT_SECONDS:
+                middle = (start + end) // 2
+                windows += [(day, start, middle), (day, middle, end)]
+            else:
+                failed[day] = f"{MIN_SPLIT_SECONDS}s 窗口仍超过 {INSIGHTS_MAX_ROWS} 行"
+    print(f"查询完成: {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+    exported = 0
+    for day in days:
+        day = day.date()
+        if day in failed:
+            print(f"  {day}: {failed[day]}，不写入（下次重新导出）", file=sys.stderr)
+            continue
+        by_phase = defaultdict(list)
+        for phase, array in parts[day]:
+            by_phase[phase].append(array)
+        samples = {phase: merge_samples(arrays) for phase, arrays in by_phase.items()}
+        store.write_day(day, samples)
+        exported += 1
+        counts = ", ".join(f"{phase} {len(array)}" for phase, array in sorted(samples.items()))
+        print(f"  {day}: {counts or '无样本'}", file=sys.stderr)
+    return exported
+
+
+def local_metrics(store: MetricStore, env: str, start_time: datetime, end_time: datetime,
+                  hourly_phase: str | None = None) -> dict:
+    """从本地存储计算范围内各 phase 的耗时分布（可选按小时分桶），不查询 Insights"""
+    started = time.perf_counter()
+    start_ms = int(start_time.timestamp() * 1000)
+    end_ms = int(end_time.timestamp() * 1000)
+    present, missing = store.coverage(start_ms, end_ms)
+    data: dict[str, Any] = {
+        "env": env,
+        "start": start_time.isoformat(),
+        "end": end_time.isoformat(),
+        "days": len(present),
+        "missing_days": [day.isoformat() for day in missing],
+        "phases": {phase: summarize(store.load(phase, start_ms, end_ms)) for phase in store.phases(present)},
+    }
+    if hourly_phase:
+        bins = {name: column.tolist() for name, column in
+                hourly(store.load(hourly_phase, start_ms, end_ms), start_ms, end_ms).items()}
+        rows = []
+        for i, hour_ms in enumerate(bins["hour_start_ms"]):
+            row = {"hour": datetime.fromtimestamp(hour_ms / 1000, timezone.utc).strftime("%Y-%m-%d %H:00"),
+                   "total": bins["total"][i]}
+            for q in PERCENTILES:
+                value = bins[f"p{q}"][i]
+                row[f"p{q}"] = None if value != value else value   # NaN: 该小时没有样本
+            rows.append(row)
+        data["hourly"] = {"phase": hourly_phase, "rows": rows}
+    data["compute_ms"] = round((time.perf_counter() - started) * 1000, 1)
     return data
 
 
+def format_metrics_md(data: dict) -> str:
+    """格式化本地耗时指标为 Markdown"""
+    lines: list[str] = []
+    lines.append(f"# AI Shell 耗时指标 ({data['start'][:16]} ~ {data['end'][:16]}) [{data['env'].upper()}]")
+    lines.append("")
+    lines.append(f"本地存储 {data['days']} 天, 计算 {data['compute_ms']:.0f}ms")
+    if data["missing_days"]:
+        lines.append(f"- !! 未导出的日期（不计入）: {', '.join(data['missing_days'])}")
+    lines.append("")
+
+    lines.append("| 阶段 | 样本数 | 平均 | P50 | P90 | P99 | 最大 |")
+    lines.append("|------|--------|------|-----|-----|-----|------|")
+    for phase, row in data["phases"].items():
+        lines.append(f"| {PHASE_LABELS.get(phase, phase)} | {row['total']} | {format_ms(row.get('avg_ms'))} | "
+                     f"{format_ms(row.get('p50'))} | {format_ms(row.get('p90'))} | {format_ms(row.get('p99'))} | "
+                     f"{format_ms(row.get('max_ms'))} |")
+    lines.append("")
+
+    compare = data.get("compare")
+    if compare:
+        lines.append(f"## 与 {compare['start'][:10]} 对比 (P90)")
+        for phase, row in data["phases"].items():
+            prev = compare["phases"].get(phase, {})
+            if row.get("p90") is not None and prev.get("p90") is not None:
+                lines.append(f"- {PHASE_LABELS.get(phase, phase)}: {format_ms(prev['p90'])} → {format_ms(row['p90'])}")
+        lines.append("")
+
+    bins = data.get("hourly")
+    if bins:
+        lines.append(f"## 按小时 ({PHASE_LABELS.get(bins['phase'], bins['phase'])})")
+        lines.append("| 小时 (UTC) | 样本数 | P50 | P90 | P99 |")
+        lines.append("|------------|--------|-----|-----|-----|")
+        for row in bins["rows"]:
+            lines.append(f"| {row['hour']} | {row['total']} | {format_ms(row['p50'])} | "
+                         f"{format_ms(row['p90'])} | {format_ms(row['p99'])} |")
+        lines.append("")
+
+    return "\n".join(lines)
+
+
 def format_report_md(data: dict) -> str:
     """格式化为 Markdown 报告"""
     lines: list[str] = []
@@ -198,13 +740,20 @@ def format_report_md(data: dict) -> str:
     lines.append(f"# AI Shell 日报 ({data['start'][:10]}) [{env}]")
     lines.append("")
 
+    # 未完成的查询（超时 / 失败）：结果为 None，对应章节标记出来，不显示成"无数据"
+    incomplete = data.get("incomplete", {})
+
+    def missing(name: str) -> str | None:
+        status = incomplete.get(name)
+        return QUERY_STATUS_LABELS.get(status, status) if status else None
+
     # 会话统计
     lines.append("## 会话统计")
-    session_rows = data.get("session_count", [])
+    session_rows = data.get("session_count") or []
     session_count = int(session_rows[0].get("total", 0)) if session_rows else 0
-    user_rows = data.get("unique_users", [])
+    user_rows = data.get("unique_users") or []
     unique_users = int(user_rows[0].get("unique_users", 0)) if user_rows else 0
-    restart_rows = data.get("restart_stats", [])
+    restart_rows = data.get("restart_stats") or []
     restart_total = 0
     restart_success = 0
     restart_failure = 0
@@ -215,18 +764,25 @@ def format_report_md(data: dict) -> str:
             restart_success = count
         else:
             restart_failure = count
-    idle_rows = data.get("idle_timeouts", [])
+    idle_rows = data.get("idle_timeouts") or []
     idle_count = int(idle_rows[0].get("total", 0)) if idle_rows else 0
 
-    lines.append(f"- 新建会话: **{session_count}**")
-    lines.append(f"- 活跃用户: **{unique_users}**")
-    lines.append(f"- Task 重启: **{restart_total}** (成功 {restart_success}, 失败 {restart_failure})")
-    lines.append(f"- 空闲超时: **{idle_count}**")
+    lines.append(f"- 新建会话: **{missing('session_count') or session_count}**")
+    lines.append(f"- 活跃用户: **{missing('unique_users') or unique_users}**")
+    if missing("restart_stats"):
+        lines.append(f"- Task 重启: **{missing('restart_stats')}**")
+    else:
+        lines.append(f"- Task 重启: **{restart_total}** (成功 {restart_success}, 失败 {restart_failure})")
+    lines.append(f"- 空闲超时: **{missing('idle_timeouts') or idle_count}**")
     lines.append("")
 
     # 用户会话明细
-    user_session_rows = data.get("user_sessions", [])
-    if user_session_rows:
+    user_session_rows = data.get("user_sessions") or []
+    if missing("user_sessions"):
+        lines.append("### 会话明细")
+        lines.append(f"- {missing('user_sessions')}，结果缺失")
+        lines.append("")
+    elif user_session_rows:
         lines.append("### 会话明细")
         lines.append("| 时间 | 用户 | 会话 ID |")
         lines.append("|------|------|---------|")
@@ -239,8 +795,10 @@ def format_report_md(data: dict) -> str:
 
     # 启动耗时
     lines.append("## 启动耗时")
-    startup_rows = data.get("task_startup", [])
-    if startup_rows:
+    startup_rows = data.get("task_startup") or []
+    if missing("task_startup"):
+        lines.append(f"- {missing('task_startup')}，结果缺失")
+    elif startup_rows:
         row = startup_rows[0]
         total = int(row.get("total", 0))
         lines.append(f"- 样本数: {total}")
@@ -252,14 +810,15 @@ def format_report_md(data: dict) -> str:
 
     # 各阶段耗时
     lines.append("### 各阶段耗时")
-    phase_rows = data.get("task_phases", [])
-    if phase_rows:
+    phase_rows = data.get("task_phases") or []
+    if missing("task_phases"):
+        lines.append(f"- {missing('task_phases')}，结果缺失")
+    elif phase_rows:
         lines.append("| 阶段 | 平均 | P90 |")
         lines.append("|------|------|-----|")
-        phase_labels = {"task_start": "RunTask API", "task_pending": "PENDING→RUNNING", "task_connect": "RUNNING→WS连接"}
         for row in phase_rows:
             phase = row.get("phase", "")
-            label = phase_labels.get(phase, phase)
+            label = PHASE_LABELS.get(phase, phase)
             lines.append(f"| {label} | {format_ms(row.get('avg_ms'))} | {format_ms(row.get('p90'))} |")
     else:
         lines.append("- 无数据")
@@ -267,8 +826,10 @@ def format_report_md(data: dict) -> str:
 
     # 慢启动
     lines.append("## 慢启动 (>10s)")
-    slow_rows = data.get("slow_startups", [])
-    if slow_rows:
+    slow_rows = data.get("slow_startups") or []
+    if missing("slow_startups"):
+        lines.append(f"- {missing('slow_startups')}，结果缺失")
+    elif slow_rows:
         lines.append(f"共 **{len(slow_rows)}** 次")
         for row in slow_rows:
             lines.append(f"- {format_ms(row.get('duration_ms'))} (user: {row.get('userId', 'N/A')[:8]}..., session: {row.get('sessionId', 'N/A')[:8]}...)")
@@ -278,8 +839,10 @@ def format_report_md(data: dict) -> str:
 
     # 消息响应
     lines.append("## 消息响应 (首字延迟)")
-    rt_rows = data.get("message_roundtrip", [])
-    if rt_rows:
+    rt_rows = data.get("message_roundtrip") or []
+    if missing("message_roundtrip"):
+        lines.append(f"- {missing('message_roundtrip')}，结果缺失")
+    elif rt_rows:
         row = rt_rows[0]
         lines.append(f"- 消息数: {int(row.get('total', 0))}")
         lines.append(f"- P50: **{format_ms(row.get('p50'))}** | P90: **{format_ms(row.get('p90'))}** | 最大: {format_ms(row.get('max_ms'))}")
@@ -289,8 +852,10 @@ def format_report_md(data: dict) -> str:
 
     # 错误统计
     lines.append("## 错误统计")
-    error_rows = data.get("errors", [])
-    if error_rows:
+    error_rows = data.get("errors") or []
+    if missing("errors"):
+        lines.append(f"- {missing('errors')}，结果缺失")
+    elif error_rows:
         lines.append("| 错误消息 | 次数 |")
         lines.append("|----------|------|")
         for row in error_rows:
@@ -303,8 +868,10 @@ def format_report_md(data: dict) -> str:
 
     # WebSocket 断开
     lines.append("## WebSocket 断开")
-    ws_rows = data.get("ws_disconnects", [])
-    if ws_rows:
+    ws_rows = data.get("ws_disconnects") or []
+    if missing("ws_disconnects"):
+        lines.append(f"- {missing('ws_disconnects')}，结果缺失")
+    elif ws_rows:
         for row in ws_rows:
             state = row.get("processingState", "unknown")
             count = int(row.get("total", 0))
@@ -344,6 +911,9 @@ def format_report_md(data: dict) -> str:
             ws_processing = int(row.get("total", 0))
     if ws_processing > 10:
         alerts.append(f"处理中断开 {ws_processing} 次 (可能丢失 AI 回复)")
+    if incomplete:
+        names = ", ".join(f"{name} ({missing(name)})" for name in incomplete)
+        alerts.append(f"{len(incomplete)} 个查询未完成，对应结果缺失而非为零: {names}")
 
     if alerts:
         lines.append("## !! 异常告警")
@@ -361,6 +931,24 @@ def main():
     parser.add_argument("--range", type=str, help="时间范围 (如 7d, 24h)")
     parser.add_argument("--format", choices=["md", "json"], default="md", help="输出格式")
     parser.add_argument("--compare", type=str, help="对比日期 (YYYY-MM-DD)")
+    parser.add_argument("--export-trace", type=str, metavar="PATH", help="导出会话到达轨迹 (JSONL) 后退出")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help=f"同时运行的 Insights 查询数上限 (默认 {DEFAULT_MAX_CONCURRENT}，账号上限 30)")
+    parser.add_argument("--query-plan", choices=QUERY_PLANS, default="consolidated",
+                        help="consolidated: task_lifecycle 章节合并为两次扫描 (默认); separate: 每个章节单独查询")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"按天结果缓存目录，已结束的 UTC 整天查询结果永久缓存 (默认 {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="不读写按天结果缓存")
+    parser.add_argument("--export-metrics", action="store_true",
+                        help="把范围内已结束的 UTC 整天的原始 duration_ms 导出到本地指标存储后退出")
+    parser.add_argument("--metrics", action="store_true",
+                        help="从本地指标存储计算各阶段 P50/P90/P99（不查询 Insights，需先 --export-metrics）")
+    parser.add_argument("--hourly", nargs="?", const="task_ready", metavar="PHASE",
+                        help="配合 --metrics 输出按小时分桶的分位数 (默认阶段 task_ready)")
+    parser.add_argument("--metrics-dir", default=os.path.join(DEFAULT_CACHE_DIR, "metrics"),
+                        help="本地指标存储目录 (默认 <缓存目录>/metrics)")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                        help=f"查询截止时间（秒），到期未完成的查询在报告中标记为超时 (默认 {DEFAULT_DEADLINE:g})")
     args = parser.parse_args()
 
     now = datetime.now(timezone.utc)
@@ -386,15 +974,43 @@ def main():
         start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
         end_time = now
 
-    # 对比数据
-    compare_data = None
+    cache = None if args.no_cache else DayCache(args.cache_dir, args.env)
+
+    if (args.export_metrics or args.metrics) and not HAS_NUMPY:
+        print("错误: --export-metrics / --metrics 需要 numpy (pip install numpy)", file=sys.stderr)
+        sys.exit(1)
+    if args.export_metrics:
+        store = MetricStore(args.metrics_dir, args.env)
+        count = export_metrics(args.env, start_time, end_time, store, args.max_concurrent, args.deadline)
+        print(f"共导出 {count} 天", file=sys.stderr)
+        return
+    if args.metrics:
+        store = MetricStore(args.metrics_dir, args.env)
+        data = local_metrics(store, args.env, start_time, end_time, args.hourly)
+        if args.compare:
+            compare_date = datetime.strptime(args.compare, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            data["compare"] = local_metrics(store, args.env, compare_date, compare_date + timedelta(days=1))
+        if args.format == "json":
+            print(json.dumps(data, indent=2, default=str))
+        else:
+            print(format_metrics_md(data))
+        return
+
+    if args.export_trace:
+        count = export_trace(args.env, start_time, end_time, args.export_trace, args.max_concurrent,
+                             args.deadline, cache)
+        print(f"共导出 {count} 条会话", file=sys.stderr)
+        return
+
+    # 生成报告（对比日期的查询与当前范围一起并发执行）
+    windows = [(start_time, end_time)]
     if args.compare:
         compare_date = datetime.strptime(args.compare, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-        print(f"\n查询对比数据 ({args.compare})...", file=sys.stderr)
-        compare_data = generate_report(args.env, compare_date, compare_date + timedelta(days=1))
-
-    # 生成报告
-    data = generate_report(args.env, start_time, end_time, compare_data)
+        windows.append((compare_date, compare_date + timedelta(days=1)))
+    reports = generate_reports(args.env, windows, args.max_concurrent, args.deadline, args.query_plan,
+                               cache)
+    data = reports[0]
+    data["compare"] = reports[1] if args.compare else None
 
     if args.format == "json":
         print(json.dumps(data, indent=2, default=str))
@@ -0,0 +1,157 @@
+"""
+本地原始耗时指标存储（daily_report.py --export-metrics / --metrics）
+
+Insights 的 pct() 结果不能跨天合并，任意时间范围的分位数只能重新扫描日志。
+这里把 task_lifecycle 事件的原始 duration_ms 按 UTC 日、按 phase 落盘，
+之后任意范围的 P50/P90/P99 与按小时分桶都在本地用 NumPy 计算。
+
+目录结构（每天一个分区，写完即不可变）:
+  {root}/{env}/{YYYY-MM-DD}/{phase}.npy   结构化数组 (t: int64 毫秒时间戳, ms: float32 耗时)，按 t 升序
+  {root}/{env}/{YYYY-MM-DD}/_complete.json 分区完成标记（各 phase 样本数），没有样本的日子也有
+
+.npy 可以 mmap 读取；一天十万个样本约 1.2 MB。
+
+分位数统一取下侧秩：排序后第 floor((n-1)·q/100) 个样本（np.percentile 的
+method="lower"），总计与按小时分桶用同一定义，结果总是实际出现过的耗时。
+Insights 的 pct() 是近似值，与本地结果可能略有差异。
+"""
+
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+SAMPLE_DTYPE = [("t", "<i8"), ("ms", "<f4")]
+HOUR_MS = 3600 * 1000
+PERCENTILES = (50, 90, 99)
+COMPLETE_MARKER = "_complete.json"
+
+
+def day_start_ms(day: date) -> int:
+    """UTC 日 0 点的毫秒时间戳"""
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()) * 1000
+
+
+def days_between(start_ms: int, end_ms: int) -> list[date]:
+    """与 [start_ms, end_ms) 有交集的 UTC 日"""
+    day = datetime.fromtimestamp(start_ms / 1000, timezone.utc).date()
+    days = []
+    while day_start_ms(day) < end_ms:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def rows_to_samples(rows: list[dict]) -> dict[str, "np.ndarray"]:
+    """Insights 行 (@timestamp, phase, duration_ms) -> {phase: 按时间排序的样本数组}"""
+    by_phase: dict[str, tuple[list[str], list[str]]] = {}
+    for row in rows:
+        if "duration_ms" not in row or "@timestamp" not in row:
+            continue
+        stamps, durations = by_phase.setdefault(row.get("phase", ""), ([], []))
+        stamps.append(row["@timestamp"])
+        durations.append(row["duration_ms"])
+    samples = {}
+    for phase, (stamps, durations) in by_phase.items():
+        array = np.empty(len(stamps), dtype=SAMPLE_DTYPE)
+        array["t"] = np.array(stamps, dtype="datetime64[ms]").astype(np.int64)
+        array["ms"] = np.array(durations, dtype=np.float32)
+        samples[phase] = np.sort(array, order="t")
+    return samples
+
+
+def merge_samples(arrays: list["np.ndarray"]) -> "np.ndarray":
+    """合并多个窗口的样本并按时间排序"""
+    return np.sort(np.concatenate(arrays), order="t")
+
+
+class MetricStore:
+    """按天分区的原始耗时样本"""
+
+    def __init__(self, root: str, env: str):
+        self.root = os.path.join(root, env)
+
+    def day_dir(self, day: date) -> str:
+        return os.path.join(self.root, day.isoformat())
+
+    def has(self, day: date) -> bool:
+        return os.path.exists(os.path.join(self.day_dir(day), COMPLETE_MARKER))
+
+    def write_day(self, day: date, samples: dict[str, "np.ndarray"]):
+        """写入一天的分区（先写临时目录再改名，中断时不会留下不完整的分区）"""
+        path = self.day_dir(day)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for phase, array in samples.items():
+            np.save(os.path.join(tmp, f"{phase}.npy"), array)
+        with open(os.path.join(tmp, COMPLETE_MARKER), "w") as f:
+            json.dump({phase: len(array) for phase, array in samples.items()}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    def coverage(self, start_ms: int, end_ms: int) -> tuple[list[date], list[date]]:
+        """范围内 (已导出, 缺失) 的 UTC 日"""
+        days = days_between(start_ms, end_ms)
+        return [d for d in days if self.has(d)], [d for d in days if not self.has(d)]
+
+    def phases(self, days: list[date]) -> list[str]:
+        names = set()
+        for day in days:
+            with open(os.path.join(self.day_dir(day), COMPLETE_MARKER)) as f:
+                names.update(json.load(f))
+        return sorted(names)
+
+    def load(self, phase: str, start_ms: int, end_ms: int) -> "np.ndarray":
+        """范围 [start_ms, end_ms) 内某个 phase 的样本（只读已导出的分区）"""
+        parts = []
+        for day in self.coverage(start_ms, end_ms)[0]:
+            path = os.path.join(self.day_dir(day), f"{phase}.npy")
+            if not os.path.exists(path):
+                continue
+            array = np.load(path, mmap_mode="r")
+            lo, hi = np.searchsorted(array["t"], [start_ms, end_ms])
+            parts.append(array[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        return np.concatenate(parts)
+
+
+def summarize(samples: "np.ndarray") -> dict[str, float]:
+    """样本数、平均、P50/P90/P99、最大"""
+    ms = samples["ms"]
+    if not len(ms):
+        return {"total": 0}
+    values = np.percentile(ms, PERCENTILES, method="lower")
+    summary = {"total": int(len(ms)), "avg_ms": float(ms.mean()), "max_ms": float(ms.max())}
+    summary.update({f"p{q}": float(v) for q, v in zip(PERCENTILES, values)})
+    return summary
+
+
+def hourly(samples: "np.ndarray", start_ms: int, end_ms: int) -> dict[str, "np.ndarray"]:
+    """按小时分桶的样本数与 P50/P90/P99（没有样本的小时为 NaN）
+
+    桶对齐到 UTC 整点（第一个桶从 start_ms 所在小时的整点开始）。先按 (小时, 耗时)
+    排序，每个桶的分位数直接按秩取值（与 summarize 同为下侧秩），不需要逐桶循环。
+    """
+    start_ms -= start_ms % HOUR_MS
+    hours = -(-(end_ms - start_ms) // HOUR_MS)
+    bins = (samples["t"] - start_ms) // HOUR_MS
+    ms = samples["ms"]
+    sorted_ms = ms[np.lexsort((ms, bins))]
+    counts = np.bincount(bins, minlength=hours)[:hours]
+    starts = np.cumsum(counts) - counts
+    result = {"hour_start_ms": start_ms + np.arange(hours, dtype=np.int64) * HOUR_MS, "total": counts}
+    has_samples = counts > 0
+    for q in PERCENTILES:
+        column = np.full(hours, np.nan)
+        rank = starts + np.floor((counts - 1) * q / 100).astype(np.int64)
+        column[has_samples] = sorted_ms[rank[has_samples]]
+        result[f"p{q}"] = column
+    return result
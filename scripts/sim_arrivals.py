@@ -0,0 +1,237 @@
+"""
+模拟器到达过程
+
+所有到达过程都是产出 (到达时间, 会话时长或 None) 的迭代器，模拟器按需逐个读取。
+
+trace 回放：从 JSONL / CSV 导出（如 daily_report.py --export-trace 导出的
+session_create 事件）中逐条读取真实的会话创建时间和可选的会话时长。
+读取以生成器方式流式进行，多周的轨迹也不会整体载入内存。
+
+支持的字段:
+  时间: @timestamp / timestamp / time（ISO 8601、Insights 格式或 epoch 秒/毫秒）
+  会话时长（可选）: session_duration_ms / duration_ms / session_duration_s / duration_s
+
+日内曲线：非齐次泊松过程，到达率按小时曲线（小时之间线性插值）和星期系数
+变化，以峰值速率生成候选到达后按 thinning 接受；有 numpy 时按批向量化生成。
+
+公共随机数（CRN）：每次重复实验预先生成一份到达时间与会话时长，紧凑存放
+（float64 时间 + float32 时长），所有策略回放同一份，策略间的差异不再被
+各自的抽样噪声淹没。
+"""
+
+import csv
+from array import array
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+TIME_FIELDS = ('@timestamp', 'timestamp', 'time')
+
+# (字段名, 换算为秒的系数)
+DURATION_FIELDS = (
+    ('session_duration_ms', 0.001),
+    ('duration_ms', 0.001),
+    ('session_duration_s', 1.0),
+    ('duration_s', 1.0),
+)
+
+
+def parse_timestamp(value) -> float:
+    """解析时间戳，返回 epoch 秒"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        # ISO 8601 或 Insights 的 "2026-02-08 12:34:56.789"，无时区按 UTC
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    # 13 位 epoch 为毫秒
+    return number / 1000 if number > 1e11 else number
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """逐条读取 CSV（按扩展名）或 JSONL 记录"""
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def read_trace(path: str) -> Iterator[Tuple[float, Optional[float]]]:
+    """流式读取轨迹，产出 (相对首条记录的到达秒数, 会话时长秒数或 None)
+
+    轨迹必须按时间升序排列；遇到乱序或缺少时间字段时抛出 ValueError。
+    """
+    start = None
+    last = None
+    for index, record in enumerate(iter_records(path), 1):
+        raw = next((record[name] for name in TIME_FIELDS if record.get(name) not in (None, '')), None)
+        if raw is None:
+            raise ValueError(f"{path}: 第 {index} 条记录缺少时间字段 ({'/'.join(TIME_FIELDS)})")
+        timestamp = parse_timestamp(raw)
+        if last is not None and timestamp < last:
+            raise ValueError(f"{path}: 第 {index} 条记录时间倒序，轨迹需按时间升序排列")
+        if start is None:
+            start = timestamp
+        last = timestamp
+
+        duration = None
+        for name, scale in DURATION_FIELDS:
+            if record.get(name) not in (None, ''):
+                duration = float(record[name]) * scale
+                break
+        yield timestamp - start, duration
+
+
+# ============================================================================
+# 日内曲线（非齐次泊松到达）
+# ============================================================================
+
+# 内置曲线：每小时相对峰值的到达率（按本地钟点）
+HOURLY_PROFILES = {
+    'flat': [1.0] * 24,
+    # 工作日：夜间低谷，8-11 点早高峰爬升，午休回落，下午第二个高峰
+    'workday': [
+        0.10, 0.06, 0.04, 0.03, 0.03, 0.04, 0.08, 0.20,
+        0.45, 0.75, 0.95, 1.00, 0.80, 0.85, 0.95, 1.00,
+        0.95, 0.85, 0.65, 0.55, 0.50, 0.40, 0.28, 0.16,
+    ],
+}
+
+# 星期系数（周一到周日），用于超过一天的模拟
+WEEKLY_PROFILES = {
+    'flat': [1.0] * 7,
+    'workday': [1.0, 1.0, 1.0, 1.0, 0.95, 0.45, 0.35],
+}
+
+
+@dataclass
+class RateProfile:
+    """到达率曲线：相对峰值的比例，小时之间线性插值，星期系数按天取值"""
+    hourly: List[float]
+    weekly: List[float] = field(default_factory=lambda: [1.0] * 7)
+    start_hour: float = 0.0   # 模拟时刻 0 对应的本地钟点
+    start_weekday: int = 0    # 模拟时刻 0 对应的星期 (0=周一)
+
+    def __post_init__(self):
+        if len(self.hourly) != 24 or len(self.weekly) != 7:
+            raise ValueError("到达率曲线需要 24 个小时值和 7 个星期值")
+        # 归一化，使峰值为 1（SimConfig.request_rate 表示峰值到达率）
+        peak = max(self.hourly) * max(self.weekly)
+        if peak <= 0:
+            raise ValueError("到达率曲线峰值必须大于 0")
+        self.hourly = [h / max(self.hourly) for h in self.hourly]
+        self.weekly = [w / max(self.weekly) for w in self.weekly]
+
+    def multiplier(self, t: float) -> float:
+        """模拟时刻 t（秒）的到达率系数"""
+        hours = self.start_hour + t / 3600
+        hour_of_day = hours % 24
+        # 以每小时中点为插值节点
+        position = hour_of_day - 0.5
+        low = int(position // 1)
+        frac = position - low
+        hourly = self.hourly[low % 24] * (1 - frac) + self.hourly[(low + 1) % 24] * frac
+        return hourly * self.weekly[(self.start_weekday + int(hours // 24)) % 7]
+
+    def multipliers(self, times: "np.ndarray") -> "np.ndarray":
+        """multiplier 的向量化版本"""
+        hours = self.start_hour + times / 3600
+        nodes = np.arange(-0.5, 25.0)
+        values = np.array([self.hourly[-1]] + self.hourly + [self.hourly[0]])
+        hourly = np.interp(hours % 24, nodes, values)
+        weekly = np.array(self.weekly)[(self.start_weekday + (hours // 24).astype(np.int64)) % 7]
+        return hourly * weekly
+
+
+def parse_profile(spec: str, start_hour: float = 0.0, start_weekday: int = 0) -> RateProfile:
+    """解析 --rate-profile：内置名称 (flat/workday) 或 24 个逗号分隔的小时值"""
+    if spec in HOURLY_PROFILES:
+        return RateProfile(HOURLY_PROFILES[spec], WEEKLY_PROFILES[spec], start_hour, start_weekday)
+    values = [float(v) for v in spec.split(',')]
+    return RateProfile(values, start_hour=start_hour, start_weekday=start_weekday)
+
+
+def diurnal_arrivals(profile: RateProfile, peak_rate: float, horizon: float,
+                     seed: Optional[int] = None,
+                     batch: int = 4096) -> Iterator[Tuple[float, Optional[float]]]:
+    """非齐次泊松到达（thinning），产出 (到达时间, None)
+
+    peak_rate 为峰值到达率（每分钟）。先以峰值速率生成候选到达，再以
+    multiplier(t) 的概率接受；有 numpy 时每批生成 batch 个候选。
+    """
+    rate_max = peak_rate / 60.0
+    t = 0.0
+
+    if HAS_NUMPY:
+        rng = np.random.default_rng(seed)
+        while t < horizon:
+            candidates = t + np.cumsum(rng.exponential(1.0 / rate_max, batch))
+            t = float(candidates[-1])
+            accepted = candidates[rng.random(batch) < profile.multipliers(candidates)]
+            for arrival in accepted.tolist():
+                if arrival >= horizon:
+                    return
+                yield arrival, None
+        return
+
+    rnd = random.Random(seed)
+    while True:
+        t += rnd.expovariate(rate_max)
+        if t >= horizon:
+            return
+        if rnd.random() < profile.multiplier(t):
+            yield t, None
+
+
+# ============================================================================
+# 公共随机数
+# ============================================================================
+
+@dataclass
+class SharedStream:
+    """一次重复实验的到达时间（秒）与会话时长（秒），所有策略共用"""
+    times: "np.ndarray"       # float64（无 numpy 时为 array('d')）
+    durations: "np.ndarray"   # float32（无 numpy 时为 array('f')）
+
+    def __iter__(self) -> Iterator[Tuple[float, Optional[float]]]:
+        return zip(self.times.tolist(), self.durations.tolist())
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.times) * self.times.itemsize + len(self.durations) * self.durations.itemsize
+
+
+def shared_stream(peak_rate: float, mean_session: float, horizon: float, seed: int,
+                  profile: Optional[RateProfile] = None) -> SharedStream:
+    """生成一份公共到达流：泊松（或按 profile 的日内曲线）到达 + 指数分布会话时长
+
+    peak_rate 为每分钟到达数，mean_session 为平均会话时长（秒）。
+    """
+    if profile is None:
+        profile = RateProfile(HOURLY_PROFILES['flat'])
+    times = [t for t, _ in diurnal_arrivals(profile, peak_rate, horizon, seed)]
+
+    # 会话时长使用独立的随机数流，避免与到达间隔相关
+    if HAS_NUMPY:
+        rng = np.random.default_rng([seed, 1])
+        durations = rng.exponential(mean_session, len(times)).astype(np.float32)
+        return SharedStream(np.array(times, dtype=np.float64), durations)
+    rnd = random.Random(f"{seed}-durations")
+    return SharedStream(array('d', times), array('f', (rnd.expovariate(1.0 / mean_session) for _ in times)))
@@ -0,0 +1,135 @@
+"""
+模拟结果磁盘缓存
+
+每次重复实验的结果按内容寻址：键是 SimConfig 全部字段、种子、重复序号、
+到达过程参数与模拟器代码版本（相关源文件内容的哈希）的 SHA-256，代码一改
+旧结果自动失效。结果以紧凑 JSON 存在一个 SQLite 文件里，总大小超过上限时
+按最近访问时间淘汰（LRU）。
+
+缓存只在主进程读写：命中的任务直接返回，未命中的再交给 run_tasks 分发。
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sim_parallel import run_tasks
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'optima-sim')
+DEFAULT_MAX_MB = 256
+
+
+def code_version(*paths: str) -> str:
+    """模拟器代码版本：相关源文件内容的哈希"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def to_jsonable(value: Any) -> Any:
+    """把 dataclass / numpy 数组等转换为可稳定序列化的结构"""
+    if dataclasses.is_dataclass(value):
+        return {f.name: to_jsonable(getattr(value, f.name)) for f in dataclasses.fields(value)}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return value
+
+
+def file_identity(path: Optional[str]) -> Optional[List]:
+    """trace 文件的身份：路径、大小与修改时间（文件变化后缓存失效）"""
+    if not path:
+        return None
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+class ResultCache:
+    """按内容寻址、容量受限（LRU）的重复实验结果缓存"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_mb: float = DEFAULT_MAX_MB):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'results.sqlite')
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(**fields) -> str:
+        """由任意可序列化字段生成缓存键"""
+        payload = json.dumps(to_jsonable(fields), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Dict]:
+        """批量读取，命中的条目刷新访问时间"""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT key, value FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        if found:
+            now = time.time()
+            self.db.executemany('UPDATE results SET accessed = ? WHERE key = ?', [(now, k) for k in found])
+            self.db.commit()
+        return found
+
+    def put_many(self, items: Dict[str, Dict]):
+        """批量写入，然后按容量上限淘汰最久未访问的条目"""
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            text = json.dumps(value, separators=(',', ':'))
+            rows.append((key, text, len(text), now))
+        self.db.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', rows)
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        """总大小超过上限时按 LRU 删除"""
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self.db.execute('SELECT key, size FROM results ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self.db.executemany('DELETE FROM results WHERE key = ?', doomed)
+
+    def run(self, fn: Callable[..., Dict], tasks: Sequence[tuple], keys: Sequence[str],
+            jobs: int = 1) -> List[Dict]:
+        """带缓存的 run_tasks：只计算未命中的任务，返回顺序与 tasks 一致"""
+        cached = self.get_many(keys)
+        todo = [i for i, key in enumerate(keys) if key not in cached]
+        self.hits += len(keys) - len(todo)
+        self.misses += len(todo)
+
+        computed = run_tasks(fn, [tasks[i] for i in todo], jobs)
+        fresh = {keys[i]: result for i, result in zip(todo, computed)}
+        if fresh:
+            self.put_many(fresh)
+        cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        return f"缓存命中 {self.hits}/{total} 次重复 ({self.path})"
@@ -0,0 +1,102 @@
+"""
+模拟器到达率预测（预测式主动扩容）
+
+阈值策略要等可用槽位 / 利用率越过阈值才扩容，EC2 唤醒的 15-22 秒已经
+落在用户身上。预测策略按固定时间桶（10 秒）统计到达数，用指数平滑预测
+未来一段时间的到达率，模拟器据此提前启动 EC2 和预热 Task。
+
+  ewma          单指数平滑（水平）
+  holt-winters  加法 Holt-Winters：水平 + 趋势 + 按小时的日周期分量，
+                能跟上早高峰的爬升；日周期分量需要一天以上的数据才起作用
+
+预测器按需推进：observe / forecast 时把之前的空桶一次补齐，不需要在
+事件队列里调度额外事件。
+"""
+
+import math
+from typing import List
+
+FORECAST_BIN = 10.0          # 统计到达数的时间桶（秒）
+SEASON_SLOTS = 24            # 日周期分量：每小时一个
+SEASON_LENGTH = 24 * 3600.0
+FORECAST_Z = 1.5             # 预测到达数的安全余量（泊松标准差的倍数）
+
+
+class EwmaForecaster:
+    """指数加权移动平均到达率（每秒）"""
+
+    def __init__(self, alpha: float = 0.05):
+        self.alpha = alpha
+        self.level = 0.0
+        self.bin_start = 0.0
+        self.count = 0
+
+    def advance(self, now: float):
+        """结算 now 之前已结束的时间桶"""
+        while now >= self.bin_start + FORECAST_BIN:
+            self.update(self.count / FORECAST_BIN, self.bin_start)
+            self.count = 0
+            self.bin_start += FORECAST_BIN
+
+    def update(self, rate: float, bin_start: float):
+        self.level += self.alpha * (rate - self.level)
+
+    def observe(self, now: float):
+        """记录一个到达"""
+        self.advance(now)
+        self.count += 1
+
+    def forecast(self, now: float, horizon: float) -> float:
+        """未来 horizon 秒内的平均到达率（每秒）"""
+        self.advance(now)
+        return self.level
+
+
+class HoltWintersForecaster(EwmaForecaster):
+    """加法 Holt-Winters：水平 + 趋势 + 日周期（按小时）"""
+
+    def __init__(self, alpha: float = 0.05, beta: float = 0.005, gamma: float = 0.02):
+        super().__init__(alpha)
+        self.beta = beta
+        self.gamma = gamma
+        self.trend = 0.0
+        self.season: List[float] = [0.0] * SEASON_SLOTS
+
+    @staticmethod
+    def slot(t: float) -> int:
+        return int(t % SEASON_LENGTH // (SEASON_LENGTH / SEASON_SLOTS))
+
+    def update(self, rate: float, bin_start: float):
+        slot = self.slot(bin_start)
+        level = self.alpha * (rate - self.season[slot]) + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (level - self.level) + (1 - self.beta) * self.trend
+        self.season[slot] += self.gamma * (rate - level - self.season[slot])
+        self.level = level
+
+    def forecast(self, now: float, horizon: float) -> float:
+        self.advance(now)
+        steps = horizon / FORECAST_BIN
+        # 趋势取预测区间中点，日周期取区间终点所在小时
+        return max(0.0, self.level + self.trend * steps / 2 + self.season[self.slot(now + horizon)])
+
+
+FORECASTERS = {
+    'ewma': EwmaForecaster,
+    'holt-winters': HoltWintersForecaster,
+}
+SCALING_POLICIES = ['threshold'] + list(FORECASTERS)
+
+
+def make_forecaster(policy: str):
+    """按策略名创建预测器；threshold 返回 None"""
+    if policy == 'threshold':
+        return None
+    if policy not in FORECASTERS:
+        raise ValueError(f"未知扩容策略: {policy} (可选: {', '.join(SCALING_POLICIES)})")
+    return FORECASTERS[policy]()
+
+
+def expected_demand(rate: float, horizon: float) -> int:
+    """horizon 秒内到达数的高分位估计（均值 + FORECAST_Z 个泊松标准差）"""
+    mean = rate * horizon
+    return math.ceil(mean + FORECAST_Z * math.sqrt(mean))
@@ -0,0 +1,127 @@
+"""
+模拟器 EC2 实例与槽位（逐实例装箱 + 缩容排空）
+
+InstancePool 记录每个运行中实例的已用 Task 槽位（预热 / 启动中 / 服务中的
+Task 都占槽位）和其中的空闲预热 Task 数，用两个最小堆建索引:
+  fullest   (空闲槽位, 实例)   放置新 Task 时取空闲最少但仍有空闲的实例（best fit），
+                               让其他实例尽量空出来
+  emptiest  (忙碌槽位, 实例)   缩容时取忙碌（已用 - 预热）最少的实例排空，
+                               预热 Task 可以直接终止，不算忙碌
+堆条目在槽位变化时重新压入，过期条目在堆顶惰性丢弃，堆过大时重建。
+
+排空中的实例不再接收新 Task，其空闲预热 Task 立即终止，服务中的 Task
+结束后实例变空，由调用方停机（放回 EC2 Warm Pool 或终止）。
+"""
+
+import heapq
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+
+class InstancePool:
+    """运行中 EC2 实例的槽位占用"""
+
+    def __init__(self, tasks_per_instance: int):
+        self.slots = tasks_per_instance
+        self.used: Dict[int, int] = {}       # 可调度实例 -> 已用槽位
+        self.draining: Dict[int, int] = {}   # 排空中的实例 -> 已用槽位
+        self.warm: Dict[int, int] = {}       # 实例 -> 空闲预热 Task 数（只保留 > 0）
+        self.free = 0                        # 可调度实例的空闲槽位总数
+        self.draining_slots = 0              # 排空中实例的已用槽位总数
+        self.fullest: List[Tuple[int, int]] = []
+        self.emptiest: List[Tuple[int, int]] = []
+        self.ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.used) + len(self.draining)
+
+    def busy(self, inst: int) -> int:
+        """实例上启动中 / 服务中的 Task 数"""
+        return self.used[inst] - self.warm.get(inst, 0)
+
+    def index(self, inst: int):
+        """实例槽位或预热 Task 变化后重新压入两个堆"""
+        heapq.heappush(self.fullest, (self.slots - self.used[inst], inst))
+        heapq.heappush(self.emptiest, (self.busy(inst), inst))
+        if len(self.fullest) + len(self.emptiest) > 8 * len(self.used) + 128:
+            self.fullest = [(self.slots - used, i) for i, used in self.used.items()]
+            self.emptiest = [(self.busy(i), i) for i in self.used]
+            heapq.heapify(self.fullest)
+            heapq.heapify(self.emptiest)
+
+    def add(self) -> int:
+        """新实例就绪，返回实例编号"""
+        inst = next(self.ids)
+        self.used[inst] = 0
+        self.free += self.slots
+        self.index(inst)
+        return inst
+
+    def place(self, inst: Optional[int] = None) -> Optional[int]:
+        """占用一个槽位并返回所在实例；inst 为 None 时按 best fit 选择，没有空闲槽位时返回 None"""
+        if inst is None:
+            heap = self.fullest
+            while heap:
+                free, inst = heap[0]
+                if free > 0 and inst in self.used and self.slots - self.used[inst] == free:
+                    break
+                heapq.heappop(heap)
+            else:
+                return None
+        self.used[inst] += 1
+        self.free -= 1
+        self.index(inst)
+        return inst
+
+    def release(self, inst: int) -> bool:
+        """释放一个槽位；返回排空中的实例是否已空（调用方据此停机）"""
+        if inst in self.draining:
+            self.draining[inst] -= 1
+            self.draining_slots -= 1
+            if self.draining[inst] == 0:
+                del self.draining[inst]
+                return True
+            return False
+        self.used[inst] -= 1
+        self.free += 1
+        self.index(inst)
+        return False
+
+    def add_warm(self, inst: int):
+        """实例上的一个 Task 变为空闲预热（槽位已占用）"""
+        self.warm[inst] = self.warm.get(inst, 0) + 1
+        self.index(inst)
+
+    def take_warm(self) -> int:
+        """取出一个空闲预热 Task（槽位仍占用），返回所在实例"""
+        inst = next(iter(self.warm))
+        if self.warm[inst] == 1:
+            del self.warm[inst]
+        else:
+            self.warm[inst] -= 1
+        self.index(inst)
+        return inst
+
+    def drain(self) -> Tuple[Optional[int], int, bool]:
+        """把忙碌槽位最少的实例转入排空
+
+        返回 (实例, 终止的预热 Task 数, 是否已空)；没有可调度实例时实例为 None。
+        """
+        heap = self.emptiest
+        while heap:
+            busy, inst = heap[0]
+            if inst in self.used and self.busy(inst) == busy:
+                break
+            heapq.heappop(heap)
+        else:
+            return None, 0, False
+        heapq.heappop(heap)
+        used = self.used.pop(inst)
+        self.free -= self.slots - used
+        warm = self.warm.pop(inst, 0)
+        used -= warm
+        if used == 0:
+            return inst, warm, True
+        self.draining[inst] = used
+        self.draining_slots += used
+        return inst, warm, False
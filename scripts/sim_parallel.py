@@ -0,0 +1,34 @@
+"""
+模拟器并行执行工具
+
+simulate-capacity.py 与 simulate-multi-user.py 的每个 (策略, 种子) 重复实验
+相互独立，这里把它们分发到进程池。每个任务自带种子，结果按提交顺序返回，
+因此与串行执行逐位一致。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Sequence
+
+
+def resolve_jobs(jobs: int) -> int:
+    """解析 --jobs 参数：0 表示使用全部 CPU 核"""
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def run_tasks(fn: Callable[..., Any], tasks: Sequence[tuple], jobs: int = 1) -> List[Any]:
+    """对每组参数调用 fn，jobs > 1 时使用进程池，返回顺序与 tasks 一致
+
+    fn 必须是模块顶层函数（进程池需要按名字 pickle）。
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(tasks) <= 1:
+        return [fn(*args) for args in tasks]
+
+    workers = min(jobs, len(tasks))
+    # 任务粒度很小（单次重复实验），分块提交以减少进程间通信
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, *zip(*tasks), chunksize=chunksize))
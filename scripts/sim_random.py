@@ -0,0 +1,53 @@
+"""
+模拟器随机数流
+
+事件循环每次只需要一个随机数，逐个调用 np.random 的单标量开销比
+random.expovariate 还大。RandomStreams 用可设种子的 numpy Generator
+按块（默认 4096 个）抽取标准分布样本，逐个取用时只是列表迭代，再按
+参数缩放。没有 numpy 时退回 random.Random，接口相同。
+"""
+
+import random
+from typing import Callable, Iterator, Optional
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+DEFAULT_CHUNK = 4096
+
+
+def buffered(draw: Callable[[int], "np.ndarray"], chunk: int) -> Iterator[float]:
+    """无限流：每次用 draw 向量化抽取 chunk 个样本，再逐个产出"""
+    while True:
+        yield from draw(chunk).tolist()
+
+
+class RandomStreams:
+    """一次重复实验使用的随机数流（指数 / 正态）
+
+    stream 非 0 时使用 seed 的子流（numpy 为 [seed, stream]），与同一 seed 的
+    其他随机数流（如 diurnal_arrivals）互不相关。
+    """
+
+    def __init__(self, seed: Optional[int] = None, chunk: int = DEFAULT_CHUNK, stream: int = 0):
+        if stream and seed is not None:
+            seed = [seed, stream] if HAS_NUMPY else f"{seed}-{stream}"
+        if HAS_NUMPY:
+            self.rng = np.random.default_rng(seed)
+            self.exponential_stream = buffered(self.rng.standard_exponential, chunk)
+            self.normal_stream = buffered(self.rng.standard_normal, chunk)
+        else:
+            self.rng = random.Random(seed)
+            self.exponential_stream = iter(lambda: self.rng.expovariate(1.0), None)
+            self.normal_stream = iter(lambda: self.rng.gauss(0.0, 1.0), None)
+
+    def exponential(self, rate: float) -> float:
+        """速率为 rate 的指数分布"""
+        return next(self.exponential_stream) / rate
+
+    def gauss(self, mean: float, std: float) -> float:
+        """正态分布"""
+        return mean + std * next(self.normal_stream)
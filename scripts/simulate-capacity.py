@@ -11,15 +11,54 @@ ECS Task 预热池容量策略模拟器
 
 使用方法:
     python3 simulate-capacity.py [--verbose]
+    python3 simulate-capacity.py --engine vectorized --runs 2000  # NumPy 批量引擎
+    python3 simulate-capacity.py --runs 100 --jobs 0              # 多进程并行
+    python3 simulate-capacity.py --optimize --runs 270            # Pareto 前沿搜索
+    python3 simulate-capacity.py --bench-scaling                  # 事件循环扩展性基准
+    python3 simulate-capacity.py --trace sessions.jsonl --hours 168  # 回放真实到达轨迹
+    python3 simulate-capacity.py --rate-profile workday --hours 24  # 日内到达率曲线
+    python3 simulate-capacity.py --adaptive --ci-tolerance 0.02   # 按置信区间自适应重复次数
+    python3 simulate-capacity.py --crn --runs 20                  # 公共随机数 + 配对差异
+    python3 simulate-capacity.py --analytic                       # 解析估算与模拟对照
+    python3 simulate-capacity.py --optimize --prescreen 60        # 解析预筛后再模拟
+    python3 simulate-capacity.py --runs 50 --cache                # 复用磁盘缓存的重复实验
+    python3 simulate-capacity.py --profile --profile-json prof.json  # 热点剖析
+    python3 simulate-capacity.py --hours 720 --runs 20 --timeline cap.npz  # 导出容量时间线
+    python3 simulate-capacity.py --scaling-policy holt-winters --crn --runs 20  # 预测式扩容 vs 阈值
+    python3 simulate-capacity.py --rate-profile workday --hours 24 --scale-down 0.3  # 低谷缩容
 """
 
 import random
 import heapq
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional
-from collections import defaultdict
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, fields, replace
+from types import SimpleNamespace
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from collections import defaultdict, deque
 import argparse
 
+from sim_arrivals import (RateProfile, SharedStream, diurnal_arrivals, parse_profile, read_trace,
+                          shared_stream)
+from sim_forecast import SCALING_POLICIES, expected_demand, make_forecaster
+from sim_instances import InstancePool
+from sim_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, ResultCache, code_version, file_identity
+from sim_parallel import resolve_jobs, run_tasks
+from sim_profile import Profiler, print_profile
+from sim_stats import QuantileSketch, confidence_interval
+from sim_timeline import TimelineRecorder, write_timelines
+
+# 向量化引擎依赖 numpy，事件循环引擎只用标准库
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 # ============================================================================
 # 配置参数
 # ============================================================================
@@ -51,6 +90,9 @@ class SimConfig:
     # 扩容策略
     task_utilization_threshold: float = 0.7  # Task 利用率阈值，触发新 Task
     ec2_capacity_threshold: int = 2          # EC2 剩余容量阈值，触发扩容
+    scaling_policy: str = 'threshold'        # 主动扩容: threshold 阈值 / ewma / holt-winters 预测
+    scale_down_threshold: float = 0.0        # 缩容：Task 利用率低于该值时排空一个实例（0 表示不缩容）
+    scale_down_cooldown: float = 300.0       # 缩容冷却期（秒，距上次 EC2 就绪或缩容）
 
     # 模拟参数
     simulation_hours: float = 8.0      # 模拟时长（小时）
@@ -65,20 +107,100 @@ class SimConfig:
 # 事件驱动模拟器
 # ============================================================================
 
-@dataclass(order=True)
-class Event:
-    """模拟事件"""
-    time: float
-    event_type: str = field(compare=False)
-    data: dict = field(default_factory=dict, compare=False)
+# 事件编码：事件是 (时间, 序号, 类型, 参数) 元组，heapq 按原生元组比较，
+# 序号保证同一时刻的事件按调度顺序处理；类型是分派表下标。
+# 参数目前只用于 trace 回放时携带会话时长（request / task_ready_for_user）
+EV_REQUEST = 0
+EV_SESSION_END = 1
+EV_EC2_READY = 2
+EV_TASK_READY_FOR_USER = 3
+EV_WARM_TASK_READY = 4
+EV_REPLENISH_EC2_POOL = 5
+EV_PERIODIC_CHECK = 6
+EV_TIMELINE_SAMPLE = 7   # 只在导出时间线时调度
+
+
+class PendingQueue:
+    """启动中资源的就绪时间（最小堆，到期条目惰性移除）"""
+
+    def __init__(self):
+        self.heap: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def add(self, ready_time: float):
+        heapq.heappush(self.heap, ready_time)
+
+    def expire(self, now: float):
+        """移除已就绪（ready_time <= now）的条目"""
+        heap = self.heap
+        while heap and heap[0] <= now:
+            heapq.heappop(heap)
+
+    def count_after(self, now: float) -> int:
+        """尚未就绪（ready_time > now）的条目数
+
+        只遍历堆顶 <= now 的子树，代价与已到期但尚未移除的条目数成正比。
+        """
+        heap = self.heap
+        stale = 0
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            if i < len(heap) and heap[i] <= now:
+                stale += 1
+                stack.append(2 * i + 1)
+                stack.append(2 * i + 2)
+        return len(heap) - stale
+
+
+class CapacityTracker:
+    """容量时间积分器
+
+    按时间（而不是按事件）累计运行 EC2、活跃 Task、预热 Task 的积分，内存
+    为常数。容量时间线由 TimelineRecorder 采样。
+    """
+
+    def __init__(self, horizon: float, running_ec2: int, active_tasks: int, warm_tasks: int):
+        self.horizon = horizon
+        self.last_time = 0.0
+        self.state = (running_ec2, active_tasks, warm_tasks)
+        self.integrals = [0.0, 0.0, 0.0]
+
+    def advance(self, now: float):
+        """把当前状态累计到 now（超出模拟时长的部分不计）"""
+        now = min(now, self.horizon)
+        dt = now - self.last_time
+        if dt <= 0:
+            return
+        for i, value in enumerate(self.state):
+            self.integrals[i] += value * dt
+        self.last_time = now
+
+    def record(self, now: float, running_ec2: int, active_tasks: int, warm_tasks: int):
+        """事件处理后调用：结算上一段状态并记录新状态"""
+        self.advance(now)
+        self.state = (running_ec2, active_tasks, warm_tasks)
+
+    def averages(self) -> tuple:
+        """(平均运行 EC2, 平均活跃 Task, 平均预热 Task)"""
+        self.advance(self.horizon)
+        return tuple(total / self.horizon for total in self.integrals)
 
 
 class TaskWarmPoolSimulator:
     """ECS Task 预热池模拟器"""
 
-    def __init__(self, config: SimConfig, verbose: bool = False):
+    def __init__(self, config: SimConfig, verbose: bool = False,
+                 arrivals: Optional[Iterator[Tuple[float, Optional[float]]]] = None,
+                 recorder: Optional[TimelineRecorder] = None):
         self.config = config
         self.verbose = verbose
+        # 列式时间线导出（按固定间隔采样全部状态）；None 表示不采样
+        self.recorder = recorder
+        # trace 回放：(到达时间, 会话时长或 None) 迭代器；None 表示泊松到达
+        self.arrivals = arrivals
 
         # 状态
         self.current_time = 0.0
@@ -86,46 +208,73 @@ class TaskWarmPoolSimulator:
         # EC2 实例
         self.running_ec2 = config.initial_instances
         self.ec2_warm_pool = config.ec2_warm_pool_size
-        self.pending_ec2: List[float] = []  # EC2 就绪时间列表
+        self.pending_ec2 = PendingQueue()   # EC2 就绪时间
 
         # ECS Task
         self.active_tasks = 0              # 服务用户的 Task
         self.warm_tasks = config.warm_tasks # 空闲预热 Task
-        self.pending_tasks: List[float] = [] # 正在启动的 Task 就绪时间
+        self.warm_target = config.warm_tasks # 预热 Task 目标数（预测策略会按需调高）
+        self.pending_tasks = PendingQueue() # 正在启动的 Task 就绪时间
 
         # 会话
         self.active_sessions = 0
+        self.waiting_users = 0             # 等待 Task 就绪的用户
+
+        # 缩容：逐实例槽位（best fit 装箱 + 排空）。Task 启动延迟固定，
+        # 槽位预留按就绪顺序放进 FIFO，就绪事件依次取出所在实例；
+        # 会话结束事件的参数为所在实例。不缩容时为 None，沿用总量计数
+        self.instances: Optional[InstancePool] = None
+        if config.scale_down_threshold > 0:
+            self.instances = InstancePool(config.tasks_per_instance)
+            for _ in range(self.running_ec2):
+                self.instances.add()
+            self.warm_tasks = min(self.warm_tasks, self.instances.free)
+            for _ in range(self.warm_tasks):
+                self.instances.add_warm(self.instances.place())
+            self.user_slots: Deque[int] = deque()   # 等待 Task 就绪的用户所在实例
+            self.warm_slots: Deque[int] = deque()   # 启动中的预热 Task 所在实例
+            self.last_scaling = 0.0
+
+        # 到达率预测器（预测式扩容策略）；threshold 策略为 None
+        self.forecaster = make_forecaster(config.scaling_policy)
 
         # 事件队列
-        self.events: List[Event] = []
+        self.events: List[tuple] = []
+        self.event_seq = itertools.count()
 
         # 统计
-        self.wait_times: List[float] = []
+        self.wait_times = QuantileSketch()
+        self.events_processed = 0
         self.total_requests = 0
         self.requests_instant = 0          # 即时响应（预热 Task）
         self.requests_new_task = 0         # 等待新 Task
         self.requests_new_ec2_warm = 0     # 等待 EC2 Warm Pool
         self.requests_new_ec2_cold = 0     # 等待 EC2 冷启动
 
-        # 容量跟踪
-        self.capacity_history: List[tuple] = []
+        # 容量跟踪（时间加权）
+        self.capacity = CapacityTracker(
+            config.simulation_hours * 3600,
+            self.running_ec2, self.active_tasks, self.warm_tasks,
+        )
 
     def log(self, msg: str):
         """调试日志"""
         if self.verbose:
             print(f"[{self.current_time:.1f}s] {msg}")
 
-    def schedule(self, delay: float, event_type: str, data: dict = None):
+    def schedule(self, delay: float, event_type: int, data: Optional[float] = None):
         """调度事件"""
-        heapq.heappush(self.events, Event(
-            time=self.current_time + delay,
-            event_type=event_type,
-            data=data or {}
-        ))
+        heapq.heappush(self.events, (self.current_time + delay, next(self.event_seq), event_type, data))
+
+    def schedulable_ec2(self) -> int:
+        """可调度的运行 EC2 数（不含排空中的实例）"""
+        if self.instances is None:
+            return self.running_ec2
+        return len(self.instances.used)
 
     def get_ec2_capacity(self) -> int:
         """获取 EC2 总 Task 容量"""
-        return self.running_ec2 * self.config.tasks_per_instance
+        return self.schedulable_ec2() * self.config.tasks_per_instance
 
     def get_used_task_slots(self) -> int:
         """获取已使用的 Task 槽位"""
@@ -133,9 +282,17 @@ class TaskWarmPoolSimulator:
 
     def get_available_task_slots(self) -> int:
         """获取可用于启动新 Task 的槽位"""
+        if self.instances is not None:
+            return self.instances.free
         return max(0, self.get_ec2_capacity() - self.get_used_task_slots())
 
-    def handle_request(self) -> float:
+    def session_length(self, session_duration: Optional[float]) -> float:
+        """会话时长：trace 回放给出时直接使用，否则按指数分布抽样"""
+        if session_duration is not None:
+            return session_duration
+        return random.expovariate(1.0 / (self.config.session_duration * 60))
+
+    def handle_request(self, session_duration: Optional[float] = None) -> float:
         """处理用户请求，返回等待时间"""
         self.total_requests += 1
 
@@ -147,8 +304,8 @@ class TaskWarmPoolSimulator:
             self.requests_instant += 1
 
             # 调度会话结束
-            duration = random.expovariate(1.0 / (self.config.session_duration * 60))
-            self.schedule(duration, 'session_end')
+            inst = self.instances.take_warm() if self.instances is not None else None
+            self.schedule(self.session_length(session_duration), EV_SESSION_END, inst)
 
             # 后台补充预热 Task
             self.schedule_warm_task_replenish()
@@ -159,10 +316,13 @@ class TaskWarmPoolSimulator:
         # 场景 2: 无预热 Task，但 EC2 有容量，启动新 Task
         if self.get_available_task_slots() > 0:
             wait_time = self.config.new_task_start_time
-            self.pending_tasks.append(self.current_time + wait_time)
+            self.pending_tasks.add(self.current_time + wait_time)
             self.requests_new_task += 1
+            if self.instances is not None:
+                self.user_slots.append(self.instances.place())
 
-            self.schedule(wait_time, 'task_ready_for_user')
+            self.waiting_users += 1
+            self.schedule(wait_time, EV_TASK_READY_FOR_USER, session_duration)
             self.log(f"启动新 Task (等待 {wait_time}s)")
             return wait_time
 
@@ -181,31 +341,32 @@ class TaskWarmPoolSimulator:
 
         # EC2 就绪后还需要启动 Task
         wait_time = ec2_time + self.config.new_task_start_time
-        self.pending_ec2.append(self.current_time + ec2_time)
+        self.pending_ec2.add(self.current_time + ec2_time)
 
-        self.schedule(ec2_time, 'ec2_ready')
-        self.schedule(wait_time, 'task_ready_for_user')
+        # 参数 1: 就绪时为等待的用户预留槽位（缩容模式）
+        self.schedule(ec2_time, EV_EC2_READY, 1)
+        self.waiting_users += 1
+        self.schedule(wait_time, EV_TASK_READY_FOR_USER, session_duration)
 
         # 补充 EC2 Warm Pool
-        self.schedule(30, 'replenish_ec2_pool')
+        self.schedule(30, EV_REPLENISH_EC2_POOL)
 
         return wait_time
 
     def schedule_warm_task_replenish(self):
         """调度预热 Task 补充"""
         # 检查是否需要补充，以及是否有容量
-        needed = self.config.warm_tasks - self.warm_tasks - len([
-            t for t in self.pending_tasks
-            if t > self.current_time  # 正在启动的 Task
-        ])
+        needed = self.warm_target - self.warm_tasks - self.pending_tasks.count_after(self.current_time)
 
         available = self.get_available_task_slots()
 
         to_start = min(needed, available)
         for _ in range(to_start):
             if self.get_available_task_slots() > 0:
-                self.schedule(self.config.new_task_start_time, 'warm_task_ready')
-                self.pending_tasks.append(self.current_time + self.config.new_task_start_time)
+                self.schedule(self.config.new_task_start_time, EV_WARM_TASK_READY)
+                self.pending_tasks.add(self.current_time + self.config.new_task_start_time)
+                if self.instances is not None:
+                    self.warm_slots.append(self.instances.place())
                 self.log("后台启动预热 Task")
 
     def check_proactive_scaling(self):
@@ -216,11 +377,151 @@ class TaskWarmPoolSimulator:
         if available_slots < self.config.ec2_capacity_threshold:
             if self.ec2_warm_pool > 0:
                 self.ec2_warm_pool -= 1
-                self.schedule(self.config.ec2_warm_start_time, 'ec2_ready')
-                self.pending_ec2.append(self.current_time + self.config.ec2_warm_start_time)
-                self.schedule(30, 'replenish_ec2_pool')
+                self.schedule(self.config.ec2_warm_start_time, EV_EC2_READY)
+                self.pending_ec2.add(self.current_time + self.config.ec2_warm_start_time)
+                self.schedule(30, EV_REPLENISH_EC2_POOL)
                 self.log(f"主动扩容 EC2 (可用槽位: {available_slots})")
 
+    def check_predictive_scaling(self):
+        """预测式主动扩容：按预测的到达率提前启动 EC2 并调高预热 Task 目标
+
+        预热 Task 覆盖一次 Task 启动时间内的到达，EC2 容量（含启动中的）覆盖
+        一次 EC2 唤醒 + Task 启动时间内的到达，到达数取高分位估计。
+        """
+        config = self.config
+        now = self.current_time
+        task_lead = config.new_task_start_time
+        ec2_lead = config.ec2_warm_start_time + config.new_task_start_time
+        self.warm_target = max(config.warm_tasks,
+                               expected_demand(self.forecaster.forecast(now, task_lead), task_lead))
+
+        pending_ec2 = self.pending_ec2.count_after(now)
+        needed = (self.active_tasks + self.pending_tasks.count_after(now) + max(self.warm_tasks, self.warm_target)
+                  + expected_demand(self.forecaster.forecast(now, ec2_lead), ec2_lead))
+        while ((self.schedulable_ec2() + pending_ec2) * config.tasks_per_instance < needed
+               and self.ec2_warm_pool > 0 and self.running_ec2 + pending_ec2 < config.max_instances):
+            self.ec2_warm_pool -= 1
+            pending_ec2 += 1
+            self.schedule(config.ec2_warm_start_time, EV_EC2_READY)
+            self.pending_ec2.add(now + config.ec2_warm_start_time)
+            self.schedule(30, EV_REPLENISH_EC2_POOL)
+            self.log(f"预测扩容 EC2 (预计需要槽位: {needed})")
+
+    def on_request(self, session_duration: Optional[float]):
+        """用户请求到达"""
+        if self.forecaster is not None:
+            self.forecaster.observe(self.current_time)
+        wait_time = self.handle_request(session_duration)
+        self.wait_times.add(wait_time)
+        self.schedule_next_request()
+
+    def on_session_end(self, inst: Optional[int]):
+        """会话结束，Task 变回预热状态（所在实例正在排空时终止，实例已空则停机）"""
+        self.active_sessions -= 1
+        self.active_tasks -= 1
+        if self.instances is not None and inst in self.instances.draining:
+            if self.instances.release(inst):
+                self.stop_instance()
+            return
+        if self.instances is not None:
+            self.instances.add_warm(inst)
+        self.warm_tasks += 1
+        self.log(f"会话结束 (活跃: {self.active_sessions}, 预热: {self.warm_tasks})")
+
+    def on_ec2_ready(self, for_user: Optional[int]):
+        """EC2 就绪"""
+        self.running_ec2 += 1
+        self.pending_ec2.expire(self.current_time)
+        if self.instances is not None:
+            inst = self.instances.add()
+            self.last_scaling = self.current_time
+            if for_user:
+                self.user_slots.append(self.instances.place(inst))
+        self.log(f"EC2 就绪 (运行: {self.running_ec2})")
+
+    def on_task_ready_for_user(self, session_duration: Optional[float]):
+        """Task 就绪，分配给用户"""
+        self.pending_tasks.expire(self.current_time)
+        self.waiting_users -= 1
+        self.active_tasks += 1
+        self.active_sessions += 1
+        inst = self.user_slots.popleft() if self.instances is not None else None
+        self.schedule(self.session_length(session_duration), EV_SESSION_END, inst)
+        self.log(f"Task 就绪分配 (活跃: {self.active_sessions})")
+
+    def on_warm_task_ready(self, _data):
+        """预热 Task 就绪"""
+        self.pending_tasks.expire(self.current_time)
+        if self.instances is not None:
+            inst = self.warm_slots.popleft()
+            if inst not in self.instances.used:
+                # 启动期间所在实例已被排空：Task 直接终止，实例空了就停机
+                if self.instances.release(inst):
+                    self.stop_instance()
+                self.log(f"预热 Task 就绪时实例 {inst} 已排空，终止")
+                return
+            self.instances.add_warm(inst)
+        self.warm_tasks += 1
+        self.log(f"预热 Task 就绪 (预热: {self.warm_tasks})")
+
+    def check_scale_down(self):
+        """缩容：Task 利用率低于 scale_down_threshold 且过了冷却期时，排空忙碌 Task 最少的实例
+
+        排空实例上的预热 Task 立即终止，服务中的会话结束后停机；
+        至少保留 initial_instances 个可调度实例。利用率的分母包含排空中实例的已用槽位，
+        与分子里这些实例上的会话一致。
+        """
+        config = self.config
+        if (self.current_time - self.last_scaling < config.scale_down_cooldown
+                or len(self.instances.used) <= config.initial_instances
+                or self.active_tasks >= config.scale_down_threshold * (
+                    self.get_ec2_capacity() + self.instances.draining_slots)):
+            return
+        inst, warm, empty = self.instances.drain()
+        self.warm_tasks -= warm
+        self.last_scaling = self.current_time
+        self.log(f"缩容排空实例 {inst} (终止预热 Task: {warm})")
+        if empty:
+            self.stop_instance()
+
+    def stop_instance(self):
+        """排空完成的实例停机：EC2 Warm Pool 未满时休眠放回，否则终止"""
+        self.running_ec2 -= 1
+        if self.ec2_warm_pool < self.config.ec2_warm_pool_size:
+            self.ec2_warm_pool += 1
+        self.log(f"EC2 停机 (运行: {self.running_ec2})")
+
+    def on_replenish_ec2_pool(self, _data):
+        """补充 EC2 Warm Pool"""
+        while self.ec2_warm_pool < self.config.ec2_warm_pool_size:
+            self.ec2_warm_pool += 1
+            self.log(f"补充 EC2 Warm Pool (当前: {self.ec2_warm_pool})")
+
+    def on_periodic_check(self, _data):
+        """定期检查：主动扩容 + 补充预热 Task"""
+        self.check_proactive_scaling()
+        if self.forecaster is not None:
+            self.check_predictive_scaling()
+        if self.instances is not None:
+            self.check_scale_down()
+        self.schedule_warm_task_replenish()
+        self.schedule(10, EV_PERIODIC_CHECK)
+
+    def on_timeline_sample(self, _data):
+        """时间线采样（只读状态，不影响模拟结果）"""
+        now = self.current_time
+        self.recorder.sample(
+            self.wait_times,
+            running_ec2=self.running_ec2,
+            warm_tasks=self.warm_tasks,
+            active_tasks=self.active_tasks,
+            pending_tasks=self.pending_tasks.count_after(now),
+            pending_ec2=self.pending_ec2.count_after(now),
+            queue_length=self.waiting_users,
+        )
+        if now + self.recorder.interval < self.config.simulation_hours * 3600:
+            self.schedule(self.recorder.interval, EV_TIMELINE_SAMPLE)
+
     def run(self) -> Dict:
         """运行模拟"""
         simulation_seconds = self.config.simulation_hours * 3600
@@ -229,84 +530,64 @@ class TaskWarmPoolSimulator:
         self.schedule_next_request()
 
         # 调度定期检查
-        self.schedule(10, 'periodic_check')
+        self.schedule(10, EV_PERIODIC_CHECK)
+        if self.recorder is not None:
+            self.schedule(0, EV_TIMELINE_SAMPLE)
+
+        # 分派表：下标为事件类型编码
+        handlers = [
+            self.on_request,
+            self.on_session_end,
+            self.on_ec2_ready,
+            self.on_task_ready_for_user,
+            self.on_warm_task_ready,
+            self.on_replenish_ec2_pool,
+            self.on_periodic_check,
+            self.on_timeline_sample,
+        ]
+        events = self.events
+        capacity = self.capacity
+        heappop = heapq.heappop
 
         # 事件循环
-        while self.events and self.current_time < simulation_seconds:
-            event = heapq.heappop(self.events)
-            self.current_time = event.time
-
-            if event.event_type == 'request':
-                wait_time = self.handle_request()
-                self.wait_times.append(wait_time)
-                self.schedule_next_request()
-
-            elif event.event_type == 'session_end':
-                self.active_sessions -= 1
-                self.active_tasks -= 1
-                # 会话结束，Task 变回预热状态
-                self.warm_tasks += 1
-                self.log(f"会话结束 (活跃: {self.active_sessions}, 预热: {self.warm_tasks})")
-
-            elif event.event_type == 'ec2_ready':
-                self.running_ec2 += 1
-                self.pending_ec2 = [t for t in self.pending_ec2 if t > self.current_time]
-                self.log(f"EC2 就绪 (运行: {self.running_ec2})")
-
-            elif event.event_type == 'task_ready_for_user':
-                # Task 就绪，分配给用户
-                self.pending_tasks = [t for t in self.pending_tasks if t > self.current_time]
-                self.active_tasks += 1
-                self.active_sessions += 1
-                duration = random.expovariate(1.0 / (self.config.session_duration * 60))
-                self.schedule(duration, 'session_end')
-                self.log(f"Task 就绪分配 (活跃: {self.active_sessions})")
-
-            elif event.event_type == 'warm_task_ready':
-                # 预热 Task 就绪
-                self.pending_tasks = [t for t in self.pending_tasks if t > self.current_time]
-                self.warm_tasks += 1
-                self.log(f"预热 Task 就绪 (预热: {self.warm_tasks})")
-
-            elif event.event_type == 'replenish_ec2_pool':
-                # 补充 EC2 Warm Pool
-                while self.ec2_warm_pool < self.config.ec2_warm_pool_size:
-                    self.ec2_warm_pool += 1
-                    self.log(f"补充 EC2 Warm Pool (当前: {self.ec2_warm_pool})")
-
-            elif event.event_type == 'periodic_check':
-                self.check_proactive_scaling()
-                self.schedule_warm_task_replenish()
-                self.schedule(10, 'periodic_check')
-
-            # 记录容量历史
-            self.capacity_history.append((
+        while events and self.current_time < simulation_seconds:
+            self.current_time, _, event_type, data = heappop(events)
+            self.events_processed += 1
+            handlers[event_type](data)
+
+            # 记录容量变化
+            capacity.record(
                 self.current_time,
                 self.running_ec2,
                 self.active_tasks,
                 self.warm_tasks
-            ))
+            )
 
         return self.get_results()
 
     def schedule_next_request(self):
-        """调度下一个请求（泊松分布）"""
+        """调度下一个请求（泊松分布，或 trace 中的下一条记录）"""
+        if self.arrivals is not None:
+            record = next(self.arrivals, None)
+            if record is not None:
+                arrival_time, session_duration = record
+                self.schedule(arrival_time - self.current_time, EV_REQUEST, session_duration)
+            return
+
         rate_per_second = self.config.request_rate / 60.0
         interval = random.expovariate(rate_per_second)
-        self.schedule(interval, 'request')
+        self.schedule(interval, EV_REQUEST)
 
     def get_results(self) -> Dict:
         """获取模拟结果"""
         if not self.wait_times:
             return {}
 
-        wait_times_sorted = sorted(self.wait_times)
-        n = len(wait_times_sorted)
-
-        # 计算成本
-        avg_running = sum(h[1] for h in self.capacity_history) / len(self.capacity_history) if self.capacity_history else 1
-        running_hours = avg_running * self.config.simulation_hours
-        stopped_hours = self.config.ec2_warm_pool_size * self.config.simulation_hours
+        # 计算成本（按时间加权的平均运行 EC2；超过一天按全天运行计费）
+        avg_running, avg_active, avg_warm = self.capacity.averages()
+        daily_hours = min(self.config.simulation_hours, 24)
+        running_hours = avg_running * daily_hours
+        stopped_hours = self.config.ec2_warm_pool_size * daily_hours
 
         monthly_cost = (
             running_hours * self.config.instance_cost_running * 30 +
@@ -320,16 +601,284 @@ class TaskWarmPoolSimulator:
             'requests_new_ec2_warm': self.requests_new_ec2_warm,
             'requests_new_ec2_cold': self.requests_new_ec2_cold,
             'instant_ratio': self.requests_instant / self.total_requests if self.total_requests else 0,
-            'avg_wait': sum(self.wait_times) / n,
-            'p50_wait': wait_times_sorted[int(n * 0.50)],
-            'p95_wait': wait_times_sorted[int(n * 0.95)],
-            'p99_wait': wait_times_sorted[int(n * 0.99)],
-            'max_wait': max(self.wait_times),
+            'avg_wait': self.wait_times.mean,
+            'p50_wait': self.wait_times.quantile(0.50),
+            'p95_wait': self.wait_times.quantile(0.95),
+            'p99_wait': self.wait_times.quantile(0.99),
+            'max_wait': self.wait_times.max,
             'avg_instances': avg_running,
+            'avg_active_tasks': avg_active,
+            'avg_warm_tasks': avg_warm,
             'monthly_cost': monthly_cost,
         }
 
 
+# ============================================================================
+# 向量化 Monte Carlo 引擎
+# ============================================================================
+
+# 定时器类型（确定性延迟事件）
+TIMER_TASK_USER = 1        # 占用槽位的新 Task，就绪后分配给用户
+TIMER_TASK_WARM = 2        # 占用槽位的预热 Task
+TIMER_TASK_AFTER_EC2 = 3   # EC2 扩容后分配给用户的 Task（与事件循环一致，不计入 pending_tasks）
+TIMER_EC2_READY = 4
+TIMER_REPLENISH_EC2 = 5
+
+
+class VectorizedSimulator:
+    """批量 Monte Carlo 引擎，用 NumPy 数组同时推进多个独立重复实验
+
+    请求到达与会话结束都服从指数分布，利用无记忆性把它们合并为一个竞争
+    指数时钟（速率 = 到达率 + 活跃会话数 × 结束率）；只有 Task/EC2 启动、
+    Warm Pool 补充和定期检查这类确定性延迟需要显式定时器。每一轮中每个
+    重复实验各自处理下一个事件，状态转移与 TaskWarmPoolSimulator 一一对应，
+    结果在分布上与事件循环一致。
+
+    可以一次传入多个配置：每个配置占 replications 行，配置参数按行展开为
+    数组，整批配置共用同一个事件轮次。
+
+    给出 profile 时到达率随时间变化：竞争时钟按峰值到达率抽取候选到达，
+    再按当前到达率系数接受（thinning），未接受的候选是不改变状态的空事件。
+    """
+
+    def __init__(self, configs, replications: int, seed: int = 42,
+                 profile: Optional[RateProfile] = None):
+        if not HAS_NUMPY:
+            raise RuntimeError("向量化引擎需要 numpy")
+        if isinstance(configs, SimConfig):
+            configs = [configs]
+        self.configs = list(configs)
+        self.replications = replications
+        self.profile = profile
+        self.rng = np.random.default_rng(seed)
+
+        # 配置参数按行展开：第 c 个配置占 [c*replications, (c+1)*replications) 行
+        self.params = SimpleNamespace(**{
+            f.name: np.repeat(np.array([getattr(c, f.name) for c in self.configs]), replications)
+            for f in fields(SimConfig)
+        })
+        p = self.params
+
+        n = len(self.configs) * replications
+        self.size = n
+        self.rows = np.arange(n)
+        self.now = np.zeros(n)
+
+        # 资源状态
+        self.running_ec2 = p.initial_instances.astype(np.int64)
+        self.ec2_warm_pool = p.ec2_warm_pool_size.astype(np.int64)
+        self.active_tasks = np.zeros(n, dtype=np.int64)
+        self.warm_tasks = p.warm_tasks.astype(np.int64)
+        self.pending_tasks = np.zeros(n, dtype=np.int64)  # 占用槽位的启动中 Task 数
+
+        # 定时器表：每行一个重复实验，空位为 inf，列数不够时自动扩展
+        self.timer_time = np.full((n, 8), np.inf)
+        self.timer_kind = np.zeros((n, 8), dtype=np.int8)
+        self.next_periodic = np.full(n, 10.0)
+
+        # 统计：等待时间只有 4 种取值，按类别计数即可还原分位数
+        self.requests_instant = np.zeros(n, dtype=np.int64)
+        self.requests_new_task = np.zeros(n, dtype=np.int64)
+        self.requests_new_ec2_warm = np.zeros(n, dtype=np.int64)
+        self.requests_new_ec2_cold = np.zeros(n, dtype=np.int64)
+        # 容量时间积分
+        self.running_time = np.zeros(n)
+        self.active_time = np.zeros(n)
+        self.warm_time = np.zeros(n)
+
+    def available_task_slots(self) -> "np.ndarray":
+        """每个重复实验可用于启动新 Task 的槽位"""
+        capacity = self.running_ec2 * self.params.tasks_per_instance
+        used = self.active_tasks + self.warm_tasks + self.pending_tasks
+        return np.maximum(0, capacity - used)
+
+    def add_timers(self, mask: "np.ndarray", fire_at, kind: int):
+        """为 mask 选中的重复实验各添加一个定时器"""
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return
+        free = np.isinf(self.timer_time[rows])
+        if not free.any(axis=1).all():
+            width = self.timer_time.shape[1]
+            self.timer_time = np.hstack([self.timer_time, np.full((self.size, width), np.inf)])
+            self.timer_kind = np.hstack([self.timer_kind, np.zeros((self.size, width), dtype=np.int8)])
+            free = np.isinf(self.timer_time[rows])
+        cols = free.argmax(axis=1)
+        fire_at = np.broadcast_to(fire_at, self.now.shape)
+        self.timer_time[rows, cols] = fire_at[rows]
+        self.timer_kind[rows, cols] = kind
+
+    def replenish_warm_tasks(self, mask: "np.ndarray"):
+        """对应 schedule_warm_task_replenish"""
+        needed = self.params.warm_tasks - self.warm_tasks - self.pending_tasks
+        to_start = np.where(mask, np.clip(np.minimum(needed, self.available_task_slots()), 0, None), 0)
+        fire_at = self.now + self.params.new_task_start_time
+        for i in range(int(to_start.max(initial=0))):
+            self.add_timers(to_start > i, fire_at, TIMER_TASK_WARM)
+        self.pending_tasks += to_start
+
+    def launch_ec2(self, mask: "np.ndarray", ec2_time):
+        """启动 EC2 并在 30 秒后补充 Warm Pool"""
+        self.add_timers(mask, self.now + ec2_time, TIMER_EC2_READY)
+        self.add_timers(mask, self.now + 30, TIMER_REPLENISH_EC2)
+
+    def handle_requests(self, mask: "np.ndarray"):
+        """对应 handle_request"""
+        p = self.params
+
+        # 场景 1: 有预热 Task，即时分配
+        instant = mask & (self.warm_tasks > 0)
+        self.warm_tasks -= instant
+        self.active_tasks += instant
+        self.requests_instant += instant
+        self.replenish_warm_tasks(instant)
+
+        # 场景 2: EC2 有容量，启动新 Task
+        rest = mask & ~instant
+        new_task = rest & (self.available_task_slots() > 0)
+        self.add_timers(new_task, self.now + p.new_task_start_time, TIMER_TASK_USER)
+        self.pending_tasks += new_task
+        self.requests_new_task += new_task
+
+        # 场景 3: EC2 无容量，需要扩容
+        scale = rest & ~new_task
+        from_pool = scale & (self.ec2_warm_pool > 0)
+        self.ec2_warm_pool -= from_pool
+        self.requests_new_ec2_warm += from_pool
+        self.requests_new_ec2_cold += scale & ~from_pool
+        ec2_time = np.where(from_pool, p.ec2_warm_start_time, p.ec2_cold_start_time)
+        self.launch_ec2(scale, ec2_time)
+        self.add_timers(scale, self.now + ec2_time + p.new_task_start_time, TIMER_TASK_AFTER_EC2)
+
+    def handle_timers(self, mask: "np.ndarray", cols: "np.ndarray"):
+        """触发到期的定时器"""
+        kind = np.where(mask, self.timer_kind[self.rows, cols], 0)
+        self.timer_time[self.rows[mask], cols[mask]] = np.inf
+
+        task_user = kind == TIMER_TASK_USER
+        task_warm = kind == TIMER_TASK_WARM
+        self.pending_tasks -= task_user | task_warm
+        self.active_tasks += task_user | (kind == TIMER_TASK_AFTER_EC2)
+        self.warm_tasks += task_warm
+        self.running_ec2 += kind == TIMER_EC2_READY
+        replenish = kind == TIMER_REPLENISH_EC2
+        self.ec2_warm_pool = np.where(
+            replenish, np.maximum(self.ec2_warm_pool, self.params.ec2_warm_pool_size), self.ec2_warm_pool)
+
+    def handle_periodic(self, mask: "np.ndarray"):
+        """对应 periodic_check：主动扩容 + 补充预热 Task"""
+        scale = mask & (self.available_task_slots() < self.params.ec2_capacity_threshold) & (self.ec2_warm_pool > 0)
+        self.ec2_warm_pool -= scale
+        self.launch_ec2(scale, self.params.ec2_warm_start_time)
+        self.replenish_warm_tasks(mask)
+        self.next_periodic += np.where(mask, 10.0, 0.0)
+
+    def run(self) -> Dict[str, "np.ndarray"]:
+        """运行模拟，返回每个重复实验的结果数组"""
+        p = self.params
+        end = p.simulation_hours * 3600
+        arrival_rate = p.request_rate / 60.0
+        end_rate = 1.0 / (p.session_duration * 60)
+
+        next_random = self.rng.exponential(1.0, self.size) / arrival_rate
+
+        while True:
+            live = self.now < end
+            if not live.any():
+                break
+
+            cols = self.timer_time.argmin(axis=1)
+            next_timer = self.timer_time[self.rows, cols]
+            is_timer = live & (next_timer <= next_random) & (next_timer <= self.next_periodic)
+            is_periodic = live & ~is_timer & (self.next_periodic <= next_random)
+            is_random = live & ~is_timer & ~is_periodic
+            previous = self.now
+            self.now = np.where(is_timer, next_timer,
+                                np.where(is_periodic, self.next_periodic,
+                                         np.where(is_random, next_random, self.now)))
+
+            # 事件前的状态持续到本事件（超出模拟时长的部分不计）
+            dt = np.minimum(self.now, end) - np.minimum(previous, end)
+            self.running_time += self.running_ec2 * dt
+            self.active_time += self.active_tasks * dt
+            self.warm_time += self.warm_tasks * dt
+
+            # 竞争指数时钟：按速率比例决定是请求到达还是会话结束
+            total_rate = arrival_rate + self.active_tasks * end_rate
+            is_arrival = is_random & (self.rng.random(self.size) * total_rate < arrival_rate)
+            is_session_end = is_random & ~is_arrival
+            is_request = is_arrival
+            if self.profile is not None:
+                is_request = is_arrival & (self.rng.random(self.size) < self.profile.multipliers(self.now))
+
+            self.active_tasks -= is_session_end
+            self.warm_tasks += is_session_end
+            self.handle_requests(is_request)
+            self.handle_timers(is_timer, cols)
+            self.handle_periodic(is_periodic)
+
+            # 无记忆性：每个事件后重新抽取竞争时钟
+            total_rate = arrival_rate + self.active_tasks * end_rate
+            next_random = np.where(live, self.now + self.rng.exponential(1.0, self.size) / total_rate,
+                                   next_random)
+
+        return self.get_results()
+
+    def get_results(self) -> Dict[str, "np.ndarray"]:
+        """按等待类别计数还原每个重复实验的统计量"""
+        p = self.params
+        counts = np.stack([
+            self.requests_instant,
+            self.requests_new_task,
+            self.requests_new_ec2_warm,
+            self.requests_new_ec2_cold,
+        ], axis=1)
+        waits = np.stack([
+            np.zeros(self.size),
+            p.new_task_start_time,
+            p.ec2_warm_start_time + p.new_task_start_time,
+            p.ec2_cold_start_time + p.new_task_start_time,
+        ], axis=1)
+        order = np.argsort(waits, axis=1, kind='stable')
+        counts = np.take_along_axis(counts, order, axis=1)
+        waits = np.take_along_axis(waits, order, axis=1)
+        cumulative = counts.cumsum(axis=1)
+        total = cumulative[:, -1]
+        n = np.maximum(total, 1)
+        last = counts.shape[1] - 1 - (counts[:, ::-1] > 0).argmax(axis=1)
+
+        def percentile(q: float) -> "np.ndarray":
+            index = (total * q).astype(np.int64)
+            return waits[self.rows, (cumulative > index[:, None]).argmax(axis=1)]
+
+        horizon = p.simulation_hours * 3600
+        avg_running = self.running_time / horizon
+        daily_hours = np.minimum(p.simulation_hours, 24)
+        running_hours = avg_running * daily_hours
+        stopped_hours = p.ec2_warm_pool_size * daily_hours
+
+        return {
+            'total_requests': total,
+            'requests_instant': self.requests_instant,
+            'requests_new_task': self.requests_new_task,
+            'requests_new_ec2_warm': self.requests_new_ec2_warm,
+            'requests_new_ec2_cold': self.requests_new_ec2_cold,
+            'instant_ratio': self.requests_instant / n,
+            'avg_wait': (counts * waits).sum(axis=1) / n,
+            'p50_wait': percentile(0.50),
+            'p95_wait': percentile(0.95),
+            'p99_wait': percentile(0.99),
+            'max_wait': waits[self.rows, last],
+            'avg_instances': avg_running,
+            'avg_active_tasks': self.active_time / horizon,
+            'avg_warm_tasks': self.warm_time / horizon,
+            'monthly_cost': (
+                running_hours * p.instance_cost_running * 30 +
+                stopped_hours * p.instance_cost_stopped * 30
+            ),
+        }
+
+
 # ============================================================================
 # 策略定义
 # ============================================================================
@@ -359,29 +908,591 @@ STRATEGIES = {
 
 
 # ============================================================================
-# 主程序
+# 解析估算（排队论近似，用于预筛选）
 # ============================================================================
 
-def run_simulation(strategy_name: str, config: SimConfig, verbose: bool = False) -> Dict:
-    """运行单个策略的模拟"""
-    num_runs = 5
-    results_list = []
+ANALYTIC_TIME_POINTS = 48    # 估算平均 EC2 数时的时间采样点数
+
+
+def poisson_tail(mean: float, k: int) -> float:
+    """P(Poisson(mean) ≥ k)"""
+    if k <= 0:
+        return 1.0
+    term = math.exp(-mean)
+    cdf = term
+    for i in range(1, k):
+        term *= mean / i
+        cdf += term
+    return max(0.0, 1.0 - cdf)
+
+
+def expected_peak(mean: float, horizon: float, session: float) -> float:
+    """M/M/∞ 会话数在 [0, horizon] 内的期望最大值（Poisson 的正态极值近似）"""
+    return mean + math.sqrt(2 * mean * math.log(max(horizon / session, 1.0)))
+
+
+def analytic_estimate(config: SimConfig) -> Dict:
+    """闭式估算即时响应率、等待时间与成本（每个配置几十微秒）
+
+    模型与 TaskWarmPoolSimulator 的机制对应:
+    - 会话数是从 0 开始的 M/M/∞ 过程，均值 a(1 - e^(-t/S))，a = λS
+    - Task 会话结束后回到预热状态、从不回收，Task 总数跟随会话数的历史最大值，
+      只有会话数创新高的到达才可能拿不到预热 Task，次数 ≈ E[max]
+    - 预热池是 base-stock 库存: 每次分配补充一个，耗时 L = new_task_start_time，
+      在途补充数 ~ Poisson(λL)，新高到达拿不到预热 Task 的概率 = P(Poisson(λL) ≥ W)
+    - EC2 按 tasks_per_instance 个槽位为一个周期增长，周期数 ≈ (Task 峰值 + 阈值) / 每实例 Task 数；
+      剩余槽位低于 ec2_capacity_threshold 时主动扩容（定期检查平均延迟 5s），扩容期间
+      的需求超过阈值 + 预热数才会让请求等待 EC2；阈值为 0 时从不主动扩容，每个周期都要等
+    """
+    rate = config.request_rate / 60.0
+    session = config.session_duration * 60
+    horizon = config.simulation_hours * 3600
+    load = rate * session
+
+    total_requests = rate * horizon
+    peak = expected_peak(load * (1 - math.exp(-horizon / session)), horizon, session)
+    task_waits = peak * poisson_tail(rate * config.new_task_start_time, config.warm_tasks)
+    ec2_time = config.ec2_warm_start_time if config.ec2_warm_pool_size > 0 else config.ec2_cold_start_time
+    cycles = max(0.0, (peak + config.warm_tasks + config.ec2_capacity_threshold) / config.tasks_per_instance
+                 - config.initial_instances)
+    shortage = 1.0 if config.ec2_capacity_threshold <= 0 else poisson_tail(
+        rate * (ec2_time + 5), config.ec2_capacity_threshold + config.warm_tasks)
+    ec2_waits = min(cycles * shortage, total_requests)
+    task_waits = min(task_waits, total_requests - ec2_waits)
+    misses = task_waits + ec2_waits
+
+    # 等待时间是离散分布: 0 / 新 Task / EC2 + 新 Task
+    outcomes = [
+        (0.0, total_requests - misses),
+        (config.new_task_start_time, task_waits),
+        (ec2_time + config.new_task_start_time, ec2_waits),
+    ]
+
+    def quantile(q: float) -> float:
+        cumulative = 0.0
+        for wait, count in outcomes:
+            cumulative += count
+            if cumulative > total_requests * q:
+                return wait
+        return outcomes[-1][0]
+
+    # 平均运行 EC2: Task 数 ≈ 会话数历史最大值 + 预热数，再留出扩容阈值的余量
+    instances = 0.0
+    for i in range(1, ANALYTIC_TIME_POINTS + 1):
+        t = horizon * i / ANALYTIC_TIME_POINTS
+        tasks = expected_peak(load * (1 - math.exp(-t / session)), t, session) + config.warm_tasks
+        needed = math.ceil((tasks + config.ec2_capacity_threshold) / config.tasks_per_instance)
+        instances += max(config.initial_instances, needed)
+    avg_running = instances / ANALYTIC_TIME_POINTS
+
+    daily_hours = min(config.simulation_hours, 24)
+    monthly_cost = (
+        avg_running * daily_hours * config.instance_cost_running * 30 +
+        config.ec2_warm_pool_size * daily_hours * config.instance_cost_stopped * 30
+    )
+
+    return {
+        'total_requests': total_requests,
+        'requests_instant': total_requests - misses,
+        'requests_new_task': task_waits,
+        'requests_new_ec2': ec2_waits,
+        'instant_ratio': 1 - misses / total_requests if total_requests else 0,
+        'avg_wait': sum(wait * count for wait, count in outcomes) / total_requests if total_requests else 0,
+        'p50_wait': quantile(0.50),
+        'p95_wait': quantile(0.95),
+        'p99_wait': quantile(0.99),
+        'avg_instances': avg_running,
+        'monthly_cost': monthly_cost,
+    }
+
+
+# ============================================================================
+# 容量优化器（Pareto 前沿 + Successive Halving）
+# ============================================================================
+
+# 默认搜索网格
+OPTIMIZE_GRID = {
+    'warm_tasks': list(range(0, 7)),
+    'ec2_warm_pool_size': list(range(0, 5)),
+    'ec2_capacity_threshold': list(range(0, 5)),
+    'tasks_per_instance': list(range(4, 9)),
+}
+
+# 优化目标：(指标, 方向)，1 越小越好，-1 越大越好
+OBJECTIVES = [('monthly_cost', 1), ('p95_wait', 1), ('instant_ratio', -1)]
+
+HALVING_ETA = 3              # 每轮保留约 1/3 的候选，存活者重复次数 ×3
+OPTIMIZE_BLOCK_ROWS = 8192   # 每个向量化批次的行数（配置数 × 重复次数）
+
+
+def parse_grid(specs: List[str]) -> Dict[str, List[int]]:
+    """解析 --grid 参数，如 warm_tasks=0:8 或 tasks_per_instance=4,7,8"""
+    grid = dict(OPTIMIZE_GRID)
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name not in grid:
+            raise ValueError(f"不支持的搜索参数: {name} (可选: {', '.join(grid)})")
+        if ':' in values:
+            low, high = values.split(':')
+            grid[name] = list(range(int(low), int(high) + 1))
+        else:
+            grid[name] = [int(v) for v in values.split(',')]
+    return grid
+
+
+def pareto_ranks(results: List[Dict]) -> "np.ndarray":
+    """非支配排序，返回每个候选所在的 Pareto 层（0 为前沿）
+
+    去重并按目标字典序排序后，支配者总排在被支配者之前，且排在前面的点只要
+    后两个目标都不差就支配当前点。依次为每个点二分查找第一个没有成员支配它的层
+    （若第 k 层有成员支配它，之前各层也有）。内存 O(n)，不构造 n × n 的支配矩阵。
+    """
+    points = np.array([[r[key] * sign for key, sign in OBJECTIVES] for r in results])
+    unique, inverse = np.unique(points, axis=0, return_inverse=True)
+    unique_ranks = np.zeros(len(unique), dtype=np.int64)
+    # 每层成员的后两个目标（容量倍增的缓冲区）与成员数
+    fronts: List[List] = []
+    for i, (_, second, third) in enumerate(unique):
+        low, high = 0, len(fronts)
+        while low < high:
+            mid = (low + high) // 2
+            members, count = fronts[mid]
+            if ((members[:count, 0] <= second) & (members[:count, 1] <= third)).any():
+                low = mid + 1
+            else:
+                high = mid
+        if low == len(fronts):
+            fronts.append([np.empty((16, 2)), 0])
+        front = fronts[low]
+        if front[1] == len(front[0]):
+            front[0] = np.concatenate([front[0], np.empty_like(front[0])])
+        front[0][front[1]] = second, third
+        front[1] += 1
+        unique_ranks[i] = low
+    return unique_ranks[inverse.reshape(-1)]
+
+
+def run_vectorized_grid(configs: List[SimConfig], num_runs: int, seed: int,
+                        profile: Optional[RateProfile] = None) -> List[Dict]:
+    """一个向量化批次同时跑多个配置，返回每个配置的平均结果"""
+    batch = VectorizedSimulator(configs, num_runs, seed=seed, profile=profile).run()
+    return [
+        {key: float(values[k * num_runs:(k + 1) * num_runs].mean()) for key, values in batch.items()}
+        for k in range(len(configs))
+    ]
+
+
+def optimize(grid: Dict[str, List[int]], base: SimConfig, max_runs: int,
+             min_runs: int = 10, jobs: int = 1, profile: Optional[RateProfile] = None,
+             prescreen: int = 0) -> Dict:
+    """用 Successive Halving 搜索 Pareto 前沿
+
+    第一轮所有配置只跑 min_runs 次重复；之后每轮按非支配层排序，整层保留
+    约 1/HALVING_ETA 的候选（前沿永不淘汰），存活者的累计重复次数乘以
+    HALVING_ETA，直到 max_runs。明显被支配的配置因此只消耗少量重复。
+
+    prescreen > 0 时先用解析估算给全部配置排 Pareto 层，整层保留约 prescreen
+    个配置再进入模拟。
+    """
+    names = list(grid)
+    candidates = [
+        {'params': dict(zip(names, values)), 'runs': 0, 'results': None}
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+    alive = candidates
+    if 0 < prescreen < len(candidates):
+        estimates = [analytic_estimate(replace(base, **c['params'])) for c in candidates]
+        ranks = pareto_ranks(estimates)
+        cutoff = int(np.searchsorted(np.cumsum(np.bincount(ranks)), prescreen))
+        alive = [c for c, rank in zip(candidates, ranks) if rank <= cutoff]
+        print(f"  解析预筛: {len(candidates)} → {len(alive)} 个配置 (前 {cutoff + 1} 层)", flush=True)
+
+    target = min(min_runs, max_runs)
+    total_runs = 0
+    round_index = 0
+    while True:
+        extra = target - alive[0]['runs']
+        # 分块保证批次大小（以及随机种子）与 --jobs 无关，结果可复现
+        per_block = max(1, OPTIMIZE_BLOCK_ROWS // extra)
+        blocks = [alive[i:i + per_block] for i in range(0, len(alive), per_block)]
+        tasks = [
+            ([replace(base, **c['params']) for c in block], extra, 42 + round_index * 100003 + b, profile)
+            for b, block in enumerate(blocks)
+        ]
+        outputs = [r for block_results in run_tasks(run_vectorized_grid, tasks, jobs) for r in block_results]
+
+        for candidate, results in zip(alive, outputs):
+            done = candidate['runs']
+            if candidate['results'] is None:
+                candidate['results'] = results
+            else:
+                candidate['results'] = {
+                    key: (candidate['results'][key] * done + value * extra) / (done + extra)
+                    for key, value in results.items()
+                }
+            candidate['runs'] = done + extra
+        total_runs += extra * len(alive)
+
+        ranks = pareto_ranks([c['results'] for c in alive])
+        print(f"  第 {round_index + 1} 轮: {len(alive)} 个配置 × {target} 次重复, "
+              f"前沿 {int((ranks == 0).sum())} 个", flush=True)
+        if target >= max_runs or len(alive) == int((ranks == 0).sum()):
+            break
+
+        # 整层保留，直到覆盖约 1/HALVING_ETA 的候选
+        keep = math.ceil(len(alive) / HALVING_ETA)
+        layer_sizes = np.bincount(ranks)
+        cutoff = int(np.searchsorted(np.cumsum(layer_sizes), keep))
+        alive = [c for c, rank in zip(alive, ranks) if rank <= cutoff]
+        target = min(target * HALVING_ETA, max_runs)
+        round_index += 1
+
+    frontier = [c for c, rank in zip(alive, ranks) if rank == 0]
+    frontier.sort(key=lambda c: c['results']['monthly_cost'])
+    return {
+        'frontier': frontier,
+        'candidates': len(candidates),
+        'total_runs': total_runs,
+        'max_runs': max_runs,
+    }
+
+
+def print_frontier(summary: Dict):
+    """打印 Pareto 前沿"""
+    print()
+    print("=" * 100)
+    print("                   Pareto 前沿（月成本 / P95 等待 / 即时响应率）")
+    print("=" * 100)
+    print()
+    print(f"{'预热Task':>8} {'EC2池':>6} {'扩容阈值':>8} {'Task/EC2':>8} "
+          f"{'即时响应':>10} {'P95等待':>10} {'平均等待':>10} {'月成本':>10} {'重复':>6}")
+    print("-" * 100)
+    for c in summary['frontier']:
+        p, r = c['params'], c['results']
+        print(f"{p.get('warm_tasks', ''):>8} {p.get('ec2_warm_pool_size', ''):>6} "
+              f"{p.get('ec2_capacity_threshold', ''):>8} {p.get('tasks_per_instance', ''):>8} "
+              f"{r['instant_ratio']*100:>9.1f}% "
+              f"{format_time(r['p95_wait']):>10} "
+              f"{format_time(r['avg_wait']):>10} "
+              f"${r['monthly_cost']:>8.0f} "
+              f"{c['runs']:>6}")
+    print("-" * 100)
+
+    full = summary['candidates'] * summary['max_runs']
+    print(f"共 {summary['candidates']} 个配置，累计 {summary['total_runs']} 次重复 "
+          f"(全量评估需 {full} 次，节省 {(1 - summary['total_runs'] / full) * 100:.0f}%)")
+    print()
+
+
+# ============================================================================
+# 扩展性基准
+# ============================================================================
+
+SCALING_RATES = [50, 500, 5000]   # 请求率（每分钟）
+SCALING_REQUESTS = 50000          # 每个请求率模拟的请求数（按此折算模拟时长）
+
 
-    for i in range(num_runs):
-        random.seed(42 + i)
-        sim = TaskWarmPoolSimulator(config, verbose=(verbose and i == 0))
-        results = sim.run()
-        results_list.append(results)
+def benchmark_scaling(rates: List[float] = SCALING_RATES, requests: int = SCALING_REQUESTS):
+    """不同请求率下事件循环的单事件开销，用于确认开销不随负载增长"""
+    print()
+    print("事件循环扩展性基准 (固定种子 42)")
+    print("-" * 70)
+    print(f"{'请求率/分钟':>12} {'模拟时长':>10} {'事件数':>10} {'耗时':>8} {'事件/秒':>10} {'µs/事件':>8}")
+    print("-" * 70)
+    for rate in rates:
+        config = SimConfig(request_rate=rate, simulation_hours=requests / (rate * 60))
+        random.seed(42)
+        sim = TaskWarmPoolSimulator(config)
+        started = time.perf_counter()
+        sim.run()
+        elapsed = time.perf_counter() - started
+        print(f"{rate:>12g} {config.simulation_hours:>9.2f}h {sim.events_processed:>10} "
+              f"{elapsed:>7.2f}s {sim.events_processed / elapsed:>10.0f} "
+              f"{elapsed / sim.events_processed * 1e6:>8.2f}")
+    print("-" * 70)
+    print()
+
+
+# ============================================================================
+# 主程序
+# ============================================================================
 
-    # 平均结果
+def run_replication(config: SimConfig, seed: int, verbose: bool = False,
+                    trace: Optional[str] = None, profile: Optional[RateProfile] = None,
+                    stream: Optional[SharedStream] = None) -> Dict:
+    """运行一次事件循环重复实验（自带种子，可在子进程中执行）
+
+    trace 为轨迹文件路径时回放真实到达；每次重复各自打开一个流式读取器。
+    profile 给出时按日内曲线生成非齐次泊松到达。stream 为公共随机数模式下
+    所有策略共用的到达与会话时长。
+    """
+    random.seed(seed)
+    arrivals = None
+    if stream is not None:
+        arrivals = iter(stream)
+    elif trace:
+        arrivals = read_trace(trace)
+    elif profile is not None:
+        arrivals = diurnal_arrivals(profile, config.request_rate, config.simulation_hours * 3600, seed)
+    sim = TaskWarmPoolSimulator(config, verbose=verbose, arrivals=arrivals)
+    return sim.run()
+
+
+# --profile 计时的方法：事件处理（调用次数即事件数）与其他热点函数
+PROFILE_HANDLERS = [
+    'on_request', 'on_session_end', 'on_ec2_ready', 'on_task_ready_for_user',
+    'on_warm_task_ready', 'on_replenish_ec2_pool', 'on_periodic_check',
+]
+PROFILE_FUNCTIONS = [
+    'handle_request', 'schedule_warm_task_replenish', 'check_proactive_scaling', 'schedule_next_request',
+    'get_available_task_slots', 'session_length', 'capacity.record', 'get_results',
+    'check_scale_down', 'stop_instance', 'instances.place', 'instances.release', 'instances.add_warm',
+    'instances.take_warm', 'instances.drain', 'instances.index',
+    'check_predictive_scaling', 'forecaster.observe', 'forecaster.forecast',
+]
+
+
+def profile_replication(config: SimConfig, seed: int = 42, trace: Optional[str] = None,
+                        profile: Optional[RateProfile] = None) -> Dict:
+    """在当前进程中运行一次带计时包装的重复实验，返回剖析报告"""
+    random.seed(seed)
+    arrivals = None
+    if trace:
+        arrivals = read_trace(trace)
+    elif profile is not None:
+        arrivals = diurnal_arrivals(profile, config.request_rate, config.simulation_hours * 3600, seed)
+    sim = TaskWarmPoolSimulator(config, arrivals=arrivals)
+    profiler = Profiler()
+    profiler.instrument(sim, PROFILE_HANDLERS, PROFILE_FUNCTIONS, 'schedule', 'events')
+    profiler.run(sim)
+    return profiler.report()
+
+
+# 影响事件循环结果的源文件，内容变化后缓存的结果自动失效
+CACHE_SOURCES = [os.path.abspath(__file__)] + [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('sim_arrivals.py', 'sim_forecast.py', 'sim_instances.py', 'sim_stats.py')
+]
+CODE_VERSION = code_version(*CACHE_SOURCES)
+
+
+def replication_key(config: SimConfig, seed: int, verbose: bool = False, trace: Optional[str] = None,
+                    profile: Optional[RateProfile] = None, stream: Optional[SharedStream] = None) -> str:
+    """run_replication 参数对应的缓存键（第 i 次重复使用种子 42 + i）"""
+    return ResultCache.make_key(
+        simulator='capacity', version=CODE_VERSION, config=config, seed=seed, replication=seed - 42,
+        trace=file_identity(trace), profile=profile, crn=stream is not None,
+    )
+
+
+def run_replications(tasks: List[tuple], jobs: int = 1, cache: Optional[ResultCache] = None) -> List[Dict]:
+    """运行一组 run_replication 任务；给出 cache 时只计算未命中的重复"""
+    if cache is None:
+        return run_tasks(run_replication, tasks, jobs)
+    return cache.run(run_replication, tasks, [replication_key(*task) for task in tasks], jobs)
+
+
+def run_vectorized_batch(config: SimConfig, num_runs: int, seed: int = 42,
+                         profile: Optional[RateProfile] = None) -> Dict:
+    """运行一批向量化重复实验，返回平均结果"""
+    batch = VectorizedSimulator(config, num_runs, seed=seed, profile=profile).run()
+    return {key: float(values.mean()) for key, values in batch.items()}
+
+
+def average_results(results_list: List[Dict]) -> Dict:
+    """按 key 平均多次重复实验的结果"""
     avg_results = {}
     for key in results_list[0].keys():
         values = [r[key] for r in results_list]
         avg_results[key] = sum(values) / len(values)
-
     return avg_results
 
 
+def run_simulation(strategy_name: str, config: SimConfig, verbose: bool = False,
+                   num_runs: int = 5, engine: str = 'event', trace: Optional[str] = None,
+                   profile: Optional[RateProfile] = None, cache: Optional[ResultCache] = None) -> Dict:
+    """运行单个策略的模拟"""
+    if engine == 'vectorized':
+        return run_vectorized_batch(config, num_runs, profile=profile)
+
+    tasks = [(config, 42 + i, verbose and i == 0, trace, profile) for i in range(num_runs)]
+    return average_results(run_replications(tasks, 1, cache))
+
+
+def run_strategies(strategies: Dict[str, SimConfig], num_runs: int = 5,
+                   engine: str = 'event', jobs: int = 1, trace: Optional[str] = None,
+                   profile: Optional[RateProfile] = None, cache: Optional[ResultCache] = None) -> Dict[str, Dict]:
+    """并行运行多个策略，每个 (策略, 种子) 重复实验是一个独立任务
+
+    种子与 run_simulation 相同，结果与串行运行逐位一致。
+    """
+    if engine == 'vectorized':
+        # 向量化引擎一批就是一个策略，按策略分发
+        tasks = [(config, num_runs, 42, profile) for config in strategies.values()]
+        return dict(zip(strategies, run_tasks(run_vectorized_batch, tasks, jobs)))
+
+    tasks = [(config, 42 + i, False, trace, profile) for config in strategies.values() for i in range(num_runs)]
+    outputs = run_replications(tasks, jobs, cache)
+    return {
+        name: average_results(outputs[k * num_runs:(k + 1) * num_runs])
+        for k, name in enumerate(strategies)
+    }
+
+
+# 自适应重复：这些指标的置信区间用于判断收敛，均值接近 0 时使用绝对下限
+CONVERGENCE_FLOORS = {'p95_wait': 0.5, 'monthly_cost': 1.0}   # 秒 / 美元
+CI_KEYS = ['instant_ratio', 'avg_wait', 'p95_wait', 'max_wait', 'monthly_cost']
+ADAPTIVE_MIN_RUNS = 5
+# 向量化引擎每轮的耗时由事件轮数决定、与批大小基本无关，因此按大批追加
+ADAPTIVE_MIN_RUNS_VECTORIZED = 1000
+
+
+def runs_needed(samples: Dict[str, List[float]], tolerance: float) -> int:
+    """按当前方差估计收敛所需的重复次数（半宽 ≤ tolerance × 均值 或绝对下限）"""
+    n = len(samples['p95_wait'])
+    needed = n
+    for key, floor in CONVERGENCE_FLOORS.items():
+        mean, half_width = confidence_interval(samples[key])
+        target = max(tolerance * abs(mean), floor)
+        if half_width > target:
+            needed = max(needed, math.ceil(n * (half_width / target) ** 2))
+    return needed
+
+
+def run_adaptive(strategies: Dict[str, SimConfig], tolerance: float, budget: float, max_runs: int,
+                 engine: str = 'event', jobs: int = 1, trace: Optional[str] = None,
+                 profile: Optional[RateProfile] = None, cache: Optional[ResultCache] = None) -> Dict[str, Dict]:
+    """逐轮追加重复实验，直到 P95 等待与月成本的 95% 置信区间收敛或时间预算用完
+
+    每轮只给未收敛的策略追加重复，追加次数按当前方差估计（最多翻倍）。
+    event 引擎第 i 次重复仍使用种子 42 + i，与固定次数模式的前缀一致；
+    vectorized 引擎每轮把所有未收敛策略放进同一批。
+    """
+    min_runs = ADAPTIVE_MIN_RUNS_VECTORIZED if engine == 'vectorized' else ADAPTIVE_MIN_RUNS
+    samples = {name: defaultdict(list) for name in strategies}
+    status = {}
+    extra = {name: min(min_runs, max_runs) for name in strategies}
+    pending = list(strategies)
+    deadline = time.perf_counter() + budget
+    round_index = 0
+
+    while pending:
+        if engine == 'vectorized':
+            count = max(extra[name] for name in pending)
+            batch = VectorizedSimulator([strategies[name] for name in pending], count,
+                                        seed=42 + round_index * 100003, profile=profile).run()
+            outputs = [
+                {key: values[k * count:(k + 1) * count].tolist() for key, values in batch.items()}
+                for k in range(len(pending))
+            ]
+        else:
+            tasks = []
+            for name in pending:
+                done = len(samples[name]['p95_wait'])
+                tasks += [(strategies[name], 42 + i, False, trace, profile) for i in range(done, done + extra[name])]
+            replications = run_replications(tasks, jobs, cache)
+            outputs = []
+            for name in pending:
+                chunk, replications = replications[:extra[name]], replications[extra[name]:]
+                outputs.append({key: [r[key] for r in chunk] for key in chunk[0]})
+
+        still_pending = []
+        for name, output in zip(pending, outputs):
+            for key, values in output.items():
+                samples[name][key].extend(values)
+            done = len(samples[name]['p95_wait'])
+            needed = runs_needed(samples[name], tolerance)
+            if needed <= done:
+                status[name] = '已收敛'
+            elif done >= max_runs:
+                status[name] = '达到重复上限'
+            else:
+                extra[name] = min(max(needed - done, min_runs), done, max_runs - done)
+                still_pending.append(name)
+        pending = still_pending
+
+        round_index += 1
+        print(f"  第 {round_index} 轮: {len(strategies) - len(pending)}/{len(strategies)} 个策略已完成", flush=True)
+        if pending and time.perf_counter() >= deadline:
+            for name in pending:
+                status[name] = '时间预算用完'
+            break
+
+    all_results = {}
+    for name in strategies:
+        results = {key: sum(values) / len(values) for key, values in samples[name].items()}
+        results['ci'] = {key: confidence_interval(samples[name][key])[1] for key in CI_KEYS}
+        results['runs'] = len(samples[name]['p95_wait'])
+        results['convergence'] = status[name]
+        all_results[name] = results
+    return all_results
+
+
+def timeline_replication(config: SimConfig, seed: int, interval: float, trace: Optional[str] = None,
+                         profile: Optional[RateProfile] = None) -> Tuple[Dict, Dict[str, "np.ndarray"]]:
+    """运行一次重复实验并按 interval 秒采样时间线，返回 (结果, 时间线各列)
+
+    种子与 run_replication 相同，采样事件只读状态，结果与不导出时一致。
+    """
+    random.seed(seed)
+    arrivals = None
+    if trace:
+        arrivals = read_trace(trace)
+    elif profile is not None:
+        arrivals = diurnal_arrivals(profile, config.request_rate, config.simulation_hours * 3600, seed)
+    recorder = TimelineRecorder(interval)
+    sim = TaskWarmPoolSimulator(config, arrivals=arrivals, recorder=recorder)
+    results = sim.run()
+    return results, recorder.finish(sim.wait_times)
+
+
+def run_timelines(strategies: Dict[str, SimConfig], num_runs: int, interval: float, jobs: int = 1,
+                  trace: Optional[str] = None, profile: Optional[RateProfile] = None
+                  ) -> Tuple[Dict[str, Dict], Dict[str, List[Dict]]]:
+    """运行全部重复实验并采样时间线，返回 (每个策略的平均结果, 每个策略逐次重复的时间线)"""
+    tasks = [(config, 42 + i, interval, trace, profile) for config in strategies.values() for i in range(num_runs)]
+    outputs = run_tasks(timeline_replication, tasks, jobs)
+    all_results = {}
+    timelines = {}
+    for k, name in enumerate(strategies):
+        chunk = outputs[k * num_runs:(k + 1) * num_runs]
+        all_results[name] = average_results([results for results, _ in chunk])
+        timelines[name] = [columns for _, columns in chunk]
+    return all_results, timelines
+
+
+# 配对差异报告的指标
+PAIRED_KEYS = [
+    ('instant_ratio', '即时响应'),
+    ('avg_wait', '平均等待'),
+    ('p95_wait', 'P95等待'),
+    ('monthly_cost', '月成本'),
+]
+
+
+def run_crn(strategies: Dict[str, SimConfig], num_runs: int, jobs: int = 1,
+            profile: Optional[RateProfile] = None,
+            cache: Optional[ResultCache] = None) -> Tuple[Dict[str, Dict], Dict[str, List[Dict]]]:
+    """公共随机数模式：第 i 次重复的到达与会话时长只生成一次，所有策略回放同一份
+
+    返回 (每个策略的平均结果, 每个策略逐次重复的结果)，后者用于配对差异。
+    """
+    configs = list(strategies.values())
+    if len({(c.request_rate, c.session_duration, c.simulation_hours) for c in configs}) > 1:
+        raise ValueError("公共随机数模式要求所有策略的请求率、会话时长和模拟时长相同")
+    base = configs[0]
+    streams = [
+        shared_stream(base.request_rate, base.session_duration * 60, base.simulation_hours * 3600, 42 + i, profile)
+        for i in range(num_runs)
+    ]
+    # profile 只用于缓存键（到达已在 stream 中）
+    tasks = [(config, 42 + i, False, None, profile, streams[i]) for config in configs for i in range(num_runs)]
+    outputs = run_replications(tasks, jobs, cache)
+    samples = {name: outputs[k * num_runs:(k + 1) * num_runs] for k, name in enumerate(strategies)}
+    return {name: average_results(runs) for name, runs in samples.items()}, samples
+
+
 def format_time(seconds: float) -> str:
     """格式化时间"""
     if seconds < 0.001:
@@ -394,6 +1505,122 @@ def format_time(seconds: float) -> str:
         return f"{seconds/60:.1f}m"
 
 
+def format_metric(key: str, value: float, signed: bool = False) -> str:
+    """格式化指标值（差异带符号）"""
+    sign = ('+' if value >= 0 else '-') if signed else ''
+    value = abs(value) if signed else value
+    if key == 'instant_ratio':
+        return f"{sign}{value * 100:.2f}%"
+    if key == 'monthly_cost':
+        return f"{sign}${value:.0f}"
+    return sign + format_time(value)
+
+
+def print_paired_differences(samples: Dict[str, List[Dict]], strategies: Dict[str, SimConfig]):
+    """打印相邻策略的配对差异（本策略 - 上一个策略），并与独立抽样的置信区间对比
+
+    排序只需要相邻策略的差异是否显著，这也是公共随机数收益最大的地方。
+    --scaling-policy 展开的策略只与同一扩容方式的上一个策略配对，
+    差异里不混入扩容方式的影响（后者见 print_policy_comparison）。
+    """
+    names = list(samples)
+    pairs = []
+    previous_by_policy: Dict[str, str] = {}
+    for name in names:
+        policy = strategies[name].scaling_policy
+        if policy in previous_by_policy:
+            pairs.append((previous_by_policy[policy], name))
+        previous_by_policy[policy] = name
+    if not pairs:
+        return
+
+    print()
+    print("=" * 100)
+    previous_label = '同一扩容方式的上一个策略' if len(previous_by_policy) > 1 else '上一个策略'
+    print(f"      配对差异（本策略 - {previous_label}，公共随机数，{len(samples[names[0]])} 次重复，95% 置信区间）")
+    print("=" * 100)
+    print()
+    print(f"{'策略':<30}" + ''.join(f"{label:>17}" for _, label in PAIRED_KEYS))
+    print("-" * 100)
+
+    ratios = defaultdict(list)
+    for previous, name in pairs:
+        baseline = samples[previous]
+        paired = []
+        independent = []
+        for key, _ in PAIRED_KEYS:
+            diffs = [r[key] - b[key] for r, b in zip(samples[name], baseline)]
+            mean, half_width = confidence_interval(diffs)
+            # 独立抽样时差异的区间半宽约为两者半宽的平方和开方
+            own = confidence_interval([r[key] for r in samples[name]])[1]
+            base = confidence_interval([b[key] for b in baseline])[1]
+            unpaired = math.hypot(own, base)
+            paired.append(f"{format_metric(key, mean, signed=True)} ±{format_metric(key, half_width)}")
+            independent.append(f"±{format_metric(key, unpaired)}")
+            if half_width > 0:
+                ratios[key].append(unpaired / half_width)
+        print(f"{name:<30}" + ''.join(f"{cell:>17}" for cell in paired))
+        print(f"{'  (独立抽样)':<30}" + ''.join(f"{cell:>17}" for cell in independent))
+    print("-" * 100)
+
+    summary = ', '.join(
+        f"{label} {sum(ratios[key]) / len(ratios[key]):.1f}x"
+        for key, label in PAIRED_KEYS if ratios[key]
+    )
+    if summary:
+        print(f"独立 / 配对区间宽度比（平均）: {summary}")
+        print("  区间窄 k 倍 ≈ 达到相同精度所需的重复次数少 k² 倍")
+    print()
+
+
+def print_policy_comparison(strategies: Dict[str, SimConfig], all_results: Dict[str, Dict], policy: str):
+    """预测式扩容相对阈值扩容的变化（同一策略、同样的种子）"""
+    keys = [('instant_ratio', '即时响应'), ('avg_wait', '平均等待'), ('p95_wait', 'P95等待'),
+            ('p99_wait', 'P99等待'), ('monthly_cost', '月成本')]
+    print()
+    print("=" * 100)
+    print(f"                         {policy} 预测扩容 vs 阈值扩容（预测 - 阈值）")
+    print("=" * 100)
+    print()
+    print(f"{'策略':<30}" + ''.join(f"{label:>14}" for _, label in keys))
+    print("-" * 100)
+    for name, config in strategies.items():
+        if config.scaling_policy != 'threshold':
+            continue
+        predicted = all_results[f"{name} + {policy}"]
+        baseline = all_results[name]
+        print(f"{name:<30}" + ''.join(
+            f"{format_metric(key, predicted[key] - baseline[key], signed=True):>14}" for key, _ in keys))
+    print("-" * 100)
+    print()
+
+
+def print_analytic_comparison(strategies: Dict[str, SimConfig], all_results: Dict[str, Dict]):
+    """解析估算与模拟结果对照（解析 / 模拟）"""
+    started = time.perf_counter()
+    estimates = {name: analytic_estimate(config) for name, config in strategies.items()}
+    elapsed = (time.perf_counter() - started) / len(strategies)
+
+    print()
+    print("=" * 100)
+    print("                         解析估算 vs 模拟（解析 / 模拟）")
+    print("=" * 100)
+    print()
+    print(f"{'策略':<30} {'即时响应':>16} {'平均等待':>16} {'P95等待':>14} {'平均EC2':>14} {'月成本':>14}")
+    print("-" * 100)
+    for name, estimate in estimates.items():
+        results = all_results[name]
+        print(f"{name:<30} "
+              f"{estimate['instant_ratio']*100:>7.1f}% / {results['instant_ratio']*100:.1f}% "
+              f"{format_time(estimate['avg_wait']):>7} / {format_time(results['avg_wait']):<6} "
+              f"{format_time(estimate['p95_wait']):>6} / {format_time(results['p95_wait']):<5} "
+              f"{estimate['avg_instances']:>6.1f} / {results['avg_instances']:<5.1f} "
+              f"${estimate['monthly_cost']:>4.0f} / ${results['monthly_cost']:<4.0f}")
+    print("-" * 100)
+    print(f"解析估算耗时: {elapsed * 1e6:.0f} µs/配置")
+    print()
+
+
 def print_results(all_results: Dict[str, Dict]):
     """打印结果表格"""
     print()
@@ -411,6 +1638,15 @@ def print_results(all_results: Dict[str, Dict]):
               f"{format_time(results['p95_wait']):>10} "
               f"{format_time(results['max_wait']):>10} "
               f"${results['monthly_cost']:>8.0f}")
+        if 'ci' in results:
+            # 自适应模式：下一行给出 95% 置信区间半宽
+            ci = results['ci']
+            print(f"{'  ± 95% CI':<30} "
+                  f"{'±' + format(ci['instant_ratio'] * 100, '.1f'):>9}% "
+                  f"{'±' + format_time(ci['avg_wait']):>10} "
+                  f"{'±' + format_time(ci['p95_wait']):>10} "
+                  f"{'±' + format_time(ci['max_wait']):>10} "
+                  f"{'±$' + format(ci['monthly_cost'], '.0f'):>9}")
 
     print("-" * 100)
     print()
@@ -420,6 +1656,8 @@ def print_results(all_results: Dict[str, Dict]):
     print("-" * 100)
     for name, results in all_results.items():
         print(f"\n{name}:")
+        if 'runs' in results:
+            print(f"  重复次数: {results['runs']} ({results['convergence']})")
         print(f"  总请求数: {results['total_requests']:.0f}")
         print(f"  即时响应 (预热Task): {results['requests_instant']:.0f} ({results['instant_ratio']*100:.1f}%)")
         print(f"  等待新Task (10s): {results['requests_new_task']:.0f}")
@@ -471,8 +1709,142 @@ def main():
     parser = argparse.ArgumentParser(description='ECS Task 预热池容量策略模拟器')
     parser.add_argument('--verbose', '-v', action='store_true', help='显示详细日志')
     parser.add_argument('--strategy', '-s', help='只运行指定策略')
+    parser.add_argument('--engine', choices=['event', 'vectorized'], default='event',
+                        help='模拟引擎: event 事件循环 / vectorized NumPy 批量 (默认: event)')
+    parser.add_argument('--runs', '-n', type=int,
+                        help='每个策略的重复次数 (默认: event 5, vectorized 1000)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='并行进程数，0 表示全部 CPU 核 (默认: 1)')
+    parser.add_argument('--optimize', action='store_true',
+                        help='搜索 Pareto 前沿（使用 vectorized 引擎，--runs 为存活配置的最终重复次数）')
+    parser.add_argument('--grid', action='append', default=[],
+                        help='搜索范围，如 warm_tasks=0:8 或 tasks_per_instance=4,7 (可重复)')
+    parser.add_argument('--min-runs', type=int, default=10,
+                        help='优化器第一轮每个配置的重复次数 (默认: 10)')
+    parser.add_argument('--hours', type=float, default=SimConfig.simulation_hours,
+                        help='模拟时长（小时），如 720 表示 30 天 (默认: 8)')
+    parser.add_argument('--bench-scaling', action='store_true',
+                        help='运行事件循环扩展性基准 (50/500/5000 请求/分钟)')
+    parser.add_argument('--trace', help='回放真实到达轨迹 (JSONL/CSV，如 daily_report.py --export-trace 的输出)')
+    parser.add_argument('--rate-profile',
+                        help='日内到达率曲线: flat / workday 或 24 个逗号分隔的小时系数（请求率为峰值）')
+    parser.add_argument('--start-hour', type=float, default=0.0,
+                        help='模拟开始的本地钟点，配合 --rate-profile (默认: 0)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='自适应重复次数：追加重复直到 P95 等待与月成本的置信区间收敛（--runs 为上限）')
+    parser.add_argument('--ci-tolerance', type=float, default=0.05,
+                        help='自适应模式的相对容差，95%% 置信区间半宽 ≤ 容差 × 均值 (默认: 0.05)')
+    parser.add_argument('--time-budget', type=float, default=60.0,
+                        help='自适应模式的时间预算（秒），用完后停止追加 (默认: 60)')
+    parser.add_argument('--analytic', action='store_true',
+                        help='同时输出解析（排队论近似）估算，与模拟结果并列对照')
+    parser.add_argument('--prescreen', type=int, default=0,
+                        help='优化器先用解析估算预筛，只保留约 N 个 Pareto 靠前的配置进入模拟 (默认: 0 不预筛)')
+    parser.add_argument('--cache', action='store_true',
+                        help='启用磁盘结果缓存（event 引擎），参数与代码未变的重复实验直接复用')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'缓存目录 (默认: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_MB,
+                        help=f'缓存容量上限 (MB)，超出后按最近访问淘汰 (默认: {DEFAULT_MAX_MB})')
+    parser.add_argument('--crn', action='store_true',
+                        help='公共随机数：每次重复的到达与会话时长由所有策略共用，并输出配对差异')
+    parser.add_argument('--scaling-policy', choices=SCALING_POLICIES, default='threshold',
+                        help='主动扩容策略：threshold 阈值 / ewma、holt-winters 按预测到达率提前扩容；'
+                             '非 threshold 时每个策略同时运行阈值版本并输出对比 (默认: threshold)')
+    parser.add_argument('--scale-down', type=float, default=0.0, metavar='THRESHOLD',
+                        help='缩容：Task 利用率低于该值且过了冷却期时排空忙碌 Task 最少的实例'
+                             '（逐实例装箱，只支持 event 引擎；0 表示不缩容）(默认: 0)')
+    parser.add_argument('--scale-down-cooldown', type=float, default=300.0,
+                        help='缩容冷却期（秒，距上次 EC2 就绪或缩容）(默认: 300)')
+    parser.add_argument('--timeline', metavar='PATH',
+                        help='把每次重复的容量时间线导出为列式文件 (.npz，或装有 pyarrow 时 .parquet)')
+    parser.add_argument('--timeline-interval', type=float, default=60.0,
+                        help='时间线采样间隔（秒）(默认: 60)')
+    parser.add_argument('--profile', action='store_true',
+                        help='剖析模式：每个策略运行一次（种子 42）并输出各类事件数、各函数耗时、事件堆峰值与峰值 RSS')
+    parser.add_argument('--profile-json', metavar='PATH',
+                        help='剖析结果另存为 JSON（配合 --profile）')
     args = parser.parse_args()
 
+    if args.bench_scaling:
+        benchmark_scaling()
+        return
+
+    if args.optimize:
+        args.engine = 'vectorized'
+    if args.engine == 'vectorized' and not HAS_NUMPY:
+        print("错误: vectorized 引擎需要 numpy (pip install numpy)", file=sys.stderr)
+        sys.exit(1)
+    if args.trace and args.engine == 'vectorized':
+        print("错误: trace 回放只支持 event 引擎", file=sys.stderr)
+        sys.exit(1)
+    if args.trace and args.rate_profile:
+        print("错误: --trace 与 --rate-profile 不能同时使用", file=sys.stderr)
+        sys.exit(1)
+    if args.crn and (args.engine == 'vectorized' or args.trace or args.adaptive):
+        print("错误: --crn 只支持 event 引擎，且不能与 --trace / --adaptive 同时使用", file=sys.stderr)
+        sys.exit(1)
+    if args.scaling_policy != 'threshold' and args.engine == 'vectorized':
+        print("错误: 预测式扩容策略只支持 event 引擎", file=sys.stderr)
+        sys.exit(1)
+    if args.scale_down > 0 and args.engine == 'vectorized':
+        print("错误: --scale-down 只支持 event 引擎", file=sys.stderr)
+        sys.exit(1)
+    if args.timeline and (args.engine == 'vectorized' or args.adaptive or args.crn or not HAS_NUMPY):
+        print("错误: --timeline 只支持 event 引擎（需要 numpy），且不能与 --adaptive / --crn 同时使用",
+              file=sys.stderr)
+        sys.exit(1)
+    profile = None
+    if args.rate_profile:
+        try:
+            profile = parse_profile(args.rate_profile, args.start_hour)
+        except ValueError as e:
+            print(f"错误: {e}", file=sys.stderr)
+            sys.exit(1)
+    selected = {}
+    for name, config in STRATEGIES.items():
+        if args.strategy and args.strategy not in name:
+            continue
+        selected[name] = replace(config, simulation_hours=args.hours, scale_down_threshold=args.scale_down,
+                                 scale_down_cooldown=args.scale_down_cooldown)
+        if args.scaling_policy != 'threshold':
+            selected[f"{name} + {args.scaling_policy}"] = replace(selected[name], scaling_policy=args.scaling_policy)
+
+    if args.profile:
+        if args.engine == 'vectorized':
+            print("错误: --profile 只支持 event 引擎", file=sys.stderr)
+            sys.exit(1)
+        reports = {}
+        for name, config in selected.items():
+            reports[name] = profile_replication(config, trace=args.trace, profile=profile)
+            print_profile(name, reports[name])
+        if args.profile_json:
+            with open(args.profile_json, 'w') as f:
+                json.dump(reports, f, indent=2, ensure_ascii=False)
+            print(f"剖析结果已写入 {args.profile_json}")
+        return
+
+    num_runs = args.runs or (1000 if args.engine == 'vectorized' else 5)
+    if args.adaptive:
+        num_runs = args.runs or (100000 if args.engine == 'vectorized' else 500)
+
+    if args.optimize:
+        try:
+            grid = parse_grid(args.grid)
+        except ValueError as e:
+            print(f"错误: {e}", file=sys.stderr)
+            sys.exit(1)
+        print("Pareto 容量优化 (Successive Halving)")
+        for name, values in grid.items():
+            print(f"  {name}: {values}")
+        print()
+        started = time.perf_counter()
+        summary = optimize(grid, SimConfig(simulation_hours=args.hours), num_runs, args.min_runs, args.jobs,
+                           profile, args.prescreen)
+        print(f"  耗时 {time.perf_counter() - started:.1f}s")
+        print_frontier(summary)
+        return
+
     print()
     print("ECS Task 预热池容量策略模拟器")
     print("=" * 50)
@@ -483,24 +1855,78 @@ def main():
     print(f"  - EC2 冷启动: ~180 秒")
     print()
     print("模拟参数:")
-    print(f"  - 请求率: 5 个/分钟（泊松分布）")
+    if args.trace:
+        print(f"  - 请求到达: 回放 {args.trace}")
+    elif profile is not None:
+        print(f"  - 请求率: 峰值 5 个/分钟（{args.rate_profile} 日内曲线，从 {args.start_hour:g} 点开始）")
+    else:
+        print(f"  - 请求率: 5 个/分钟（泊松分布）")
     print(f"  - 会话时长: 30 分钟（指数分布）")
     print(f"  - 每 EC2 容量: 7 个 Task (256MB)")
-    print(f"  - 模拟时长: 8 小时")
+    print(f"  - 模拟时长: {args.hours:g} 小时")
     print()
-    print("运行模拟中...")
+    if args.adaptive:
+        print(f"运行模拟中... (引擎: {args.engine}, 自适应重复: 容差 ±{args.ci_tolerance*100:g}%, "
+              f"上限 {num_runs} 次, 预算 {args.time_budget:g}s)")
+    else:
+        print(f"运行模拟中... (引擎: {args.engine}, 每策略 {num_runs} 次重复)")
 
     all_results = {}
-
-    for name, config in STRATEGIES.items():
-        if args.strategy and args.strategy not in name:
+    cache = ResultCache(args.cache_dir, args.cache_max_mb) if args.cache else None
+
+    if args.adaptive:
+        started = time.perf_counter()
+        all_results = run_adaptive(selected, args.ci_tolerance, args.time_budget, num_runs,
+                                   args.engine, args.jobs, args.trace, profile, cache)
+        total_runs = sum(r['runs'] for r in all_results.values())
+        print(f"  完成 ({time.perf_counter() - started:.1f}s, 共 {total_runs} 次重复)")
+    elif args.crn:
+        started = time.perf_counter()
+        all_results, samples = run_crn(selected, num_runs, args.jobs, profile, cache)
+        elapsed = time.perf_counter() - started
+        print(f"  公共随机数: {num_runs} 份到达流, 每策略回放 ({elapsed:.1f}s)")
+    elif args.timeline:
+        started = time.perf_counter()
+        all_results, timelines = run_timelines(selected, num_runs, args.timeline_interval, args.jobs,
+                                               args.trace, profile)
+        try:
+            size = write_timelines(args.timeline, timelines, args.timeline_interval)
+        except (ValueError, RuntimeError) as e:
+            print(f"错误: {e}", file=sys.stderr)
+            sys.exit(1)
+        samples = len(next(iter(timelines.values()))[0]['running_ec2'])
+        print(f"  时间线: {len(selected)} 个策略 × {num_runs} 次重复 × {samples} 个采样点 → "
+              f"{args.timeline} ({size / 1024:.0f} KB, {time.perf_counter() - started:.1f}s)")
+    elif args.jobs != 1:
+        jobs = resolve_jobs(args.jobs)
+        print(f"  并行执行: {jobs} 个进程")
+        started = time.perf_counter()
+        all_results = run_strategies(selected, num_runs, args.engine, jobs, args.trace, profile, cache)
+        elapsed = time.perf_counter() - started
+        total_runs = num_runs * len(selected)
+        print(f"  完成 ({elapsed:.1f}s, {total_runs / elapsed:.1f} 次重复/秒)")
+
+    for name, config in selected.items():
+        if name in all_results:
             continue
         print(f"  {name}...", end='', flush=True)
-        results = run_simulation(name, config, args.verbose)
+        started = time.perf_counter()
+        results = run_simulation(name, config, args.verbose, num_runs, args.engine, args.trace, profile,
+                                 cache)
+        elapsed = time.perf_counter() - started
         all_results[name] = results
-        print(" 完成")
+        print(f" 完成 ({elapsed:.1f}s, {num_runs / elapsed:.1f} 次重复/秒)")
+
+    if cache is not None:
+        print(f"  {cache.summary()}")
 
     print_results(all_results)
+    if args.scaling_policy != 'threshold':
+        print_policy_comparison(selected, all_results, args.scaling_policy)
+    if args.analytic:
+        print_analytic_comparison(selected, all_results)
+    if args.crn:
+        print_paired_differences(samples, selected)
     print_recommendations(all_results)
 
 
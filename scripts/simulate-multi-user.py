@@ -14,45 +14,33 @@
     python3 simulate-multi-user.py --duration 8 --rate 3
     python3 simulate-multi-user.py --strategy conservative
     python3 simulate-multi-user.py --compare  # 比较所有策略
+    python3 simulate-multi-user.py --compare --runs 20 --jobs 0  # 多进程并行
+    python3 simulate-multi-user.py --compare --trace sessions.jsonl --duration 168  # 回放真实到达
+    python3 simulate-multi-user.py --compare --rate-profile workday --duration 24  # 日内到达率曲线
+    python3 simulate-multi-user.py --compare --runs 20 --cache  # 复用磁盘缓存的重复实验
+    python3 simulate-multi-user.py --compare --profile --profile-json prof.json  # 热点剖析
+    python3 simulate-multi-user.py --compare --runs 20 --duration 720 --timeline mu.npz  # 导出容量时间线
+    python3 simulate-multi-user.py --compare --runs 20 --scaling-policy ewma  # 预测式扩容 vs 阈值
 """
 
 import argparse
 import json
-import random
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 import heapq
+import itertools
+import os
 
-# 尝试导入 numpy，如果没有则使用标准库
-try:
-    import numpy as np
-    HAS_NUMPY = True
-except ImportError:
-    HAS_NUMPY = False
-    import math
-
-
-def exponential_random(rate: float) -> float:
-    """生成指数分布随机数"""
-    if HAS_NUMPY:
-        return np.random.exponential(1.0 / rate)
-    else:
-        return random.expovariate(rate)
-
-
-def poisson_random(lam: float) -> int:
-    """生成泊松分布随机数"""
-    if HAS_NUMPY:
-        return np.random.poisson(lam)
-    else:
-        L = math.exp(-lam)
-        k = 0
-        p = 1.0
-        while p > L:
-            k += 1
-            p *= random.random()
-        return k - 1
+from sim_arrivals import RateProfile, diurnal_arrivals, parse_profile, read_trace
+from sim_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, ResultCache, code_version, file_identity
+from sim_forecast import SCALING_POLICIES, expected_demand, make_forecaster
+from sim_instances import InstancePool
+from sim_parallel import run_tasks
+from sim_profile import Profiler, print_profile
+from sim_random import RandomStreams
+from sim_stats import QuantileSketch
+from sim_timeline import HAS_NUMPY, TimelineRecorder, write_timelines
 
 
 @dataclass
@@ -73,6 +61,8 @@ class SimConfig:
     # 扩容策略
     scale_up_threshold: float = 0.7          # 扩容触发阈值 (70%)
     scale_down_threshold: float = 0.3        # 缩容触发阈值 (30%)
+    scale_down_cooldown: float = 300.0       # 缩容冷却期（秒，距上次 EC2 就绪或缩容）
+    scaling_policy: str = 'threshold'        # 主动扩容: threshold 阈值 / ewma / holt-winters 预测
 
     # 用户行为
     session_duration_mean: float = 30 * 60   # 会话平均时长 (30min)
@@ -83,22 +73,31 @@ class SimConfig:
     duration_hours: float = 8.0              # 模拟时长 (小时)
 
 
-@dataclass
-class Event:
-    """事件"""
-    time: float
-    event_type: str  # 'user_arrive', 'user_leave', 'task_ready', 'ec2_ready'
-    data: dict = field(default_factory=dict)
-
-    def __lt__(self, other):
-        return self.time < other.time
+# 事件编码：事件是 (时间, 序号, 类型, user_id, 参数) 元组，
+# heapq 按原生元组比较，序号保证同一时刻按调度顺序处理；类型是分派表下标。
+# 参数: ec2_ready 为 from_warm_pool，user_arrive 为 trace 回放的会话时长（或 None）
+EV_USER_ARRIVE = 0
+EV_USER_LEAVE = 1
+EV_TASK_READY = 2
+EV_EC2_READY = 3
+EV_TIMELINE_SAMPLE = 4   # 只在导出时间线时调度
 
 
 class WarmPoolSimulator:
     """预热池模拟器"""
 
-    def __init__(self, config: SimConfig):
+    def __init__(self, config: SimConfig,
+                 arrivals: Optional[Iterator[Tuple[float, Optional[float]]]] = None,
+                 rng: Optional[RandomStreams] = None,
+                 recorder: Optional[TimelineRecorder] = None):
         self.config = config
+        # 列式时间线导出（按固定间隔采样全部状态）；None 表示不采样
+        self.recorder = recorder
+        # 随机数流（按块预抽取）；未给出时不设种子
+        self.rng = rng if rng is not None else RandomStreams()
+        # 到达过程：(到达时间, 会话时长或 None) 迭代器（trace 回放或日内曲线）；
+        # None 表示泊松到达
+        self.arrivals = arrivals
         self.reset()
 
     def reset(self):
@@ -109,44 +108,94 @@ class WarmPoolSimulator:
         self.running_ec2 = self.config.initial_ec2_count
         self.ec2_warm_pool = self.config.ec2_warm_pool_size
         self.warm_tasks = self.config.warm_task_pool_size
+        self.warm_target = self.config.warm_task_pool_size   # 预测策略会按需调高
         self.active_sessions = 0
 
+        # 到达率预测器（预测式扩容策略）；threshold 策略为 None
+        self.forecaster = make_forecaster(self.config.scaling_policy)
+
         # 待处理事件
         self.pending_tasks = 0      # 正在启动的 Task
         self.pending_ec2 = 0        # 正在启动的 EC2
+        self.waiting_users = 0      # 等待资源的用户：Task 启动中，或为该用户启动的 EC2 尚未就绪
+
+        # 逐实例槽位（best fit 装箱 + 缩容排空）；user_id -> 所在实例
+        self.instances = InstancePool(self.config.tasks_per_ec2)
+        for _ in range(self.running_ec2):
+            self.instances.add()
+        # 初始预热 Task 不超过初始实例的槽位
+        self.warm_tasks = min(self.warm_tasks, self.instances.free)
+        for _ in range(self.warm_tasks):
+            self.instances.add_warm(self.instances.place())
+        self.user_instance: Dict[int, int] = {}
+        self.last_scaling = 0.0     # 上次 EC2 就绪或缩容的时间（缩容冷却期起点）
 
         # 事件队列
-        self.event_queue: List[Event] = []
+        self.event_queue: List[tuple] = []
+        self.event_seq = itertools.count()
 
-        # 结果收集
-        self.results: List[Dict] = []
-        self.wait_times: List[float] = []
+        # 结果收集（等待时间只保留分位数直方图，内存与请求数无关）
+        self.wait_times = QuantileSketch()
+        self.events_processed = 0
+        self.ec2_seconds = 0.0      # 运行 EC2 的时间积分（截至 ec2_accounted）
+        self.ec2_accounted = 0.0
+        self.next_user_id = 0
 
     def total_capacity(self) -> int:
-        """当前总容量"""
-        return self.running_ec2 * self.config.tasks_per_ec2
+        """当前总容量（不含排空中的实例）"""
+        return len(self.instances.used) * self.config.tasks_per_ec2
 
     def available_capacity(self) -> int:
         """当前可用容量"""
         return self.total_capacity() - self.active_sessions
 
+    def account_ec2(self, now: float):
+        """把运行 EC2 数累计到 now（超出模拟时长的部分不计）"""
+        now = min(now, self.end_time)
+        if now > self.ec2_accounted:
+            self.ec2_seconds += self.running_ec2 * (now - self.ec2_accounted)
+            self.ec2_accounted = now
+
     def utilization(self) -> float:
-        """当前利用率"""
-        total = self.total_capacity()
+        """当前利用率（排空中实例上的会话连同其槽位一起计入）"""
+        total = self.total_capacity() + self.instances.draining_slots
         if total == 0:
             return 1.0
         return self.active_sessions / total
 
-    def schedule_event(self, delay: float, event_type: str, data: dict = None):
+    def schedule_event(self, delay: float, event_type: int, user_id: int = -1, arg=None):
         """调度事件"""
-        event = Event(
-            time=self.current_time + delay,
-            event_type=event_type,
-            data=data or {}
+        heapq.heappush(self.event_queue, (
+            self.current_time + delay,
+            next(self.event_seq),
+            event_type,
+            user_id,
+            arg,
+        ))
+
+    def poisson_arrivals(self) -> Iterator[Tuple[float, Optional[float]]]:
+        """泊松到达：按需逐个生成 (到达时间, None)"""
+        rate_per_second = self.config.request_rate / 60
+        arrival_time = 0.0
+        while True:
+            arrival_time += self.rng.exponential(rate_per_second)
+            yield arrival_time, None
+
+    def schedule_next_arrival(self, end_time: float):
+        """读取下一个到达并调度（超过模拟时长即停止读取）"""
+        record = next(self.arrival_stream, None)
+        if record is None or record[0] >= end_time:
+            return
+        arrival_time, session_duration = record
+        self.schedule_event(
+            delay=arrival_time - self.current_time,
+            event_type=EV_USER_ARRIVE,
+            user_id=self.next_user_id,
+            arg=session_duration
         )
-        heapq.heappush(self.event_queue, event)
+        self.next_user_id += 1
 
-    def handle_user_arrive(self, user_id: int) -> float:
+    def handle_user_arrive(self, user_id: int, session_duration: Optional[float] = None) -> float:
         """处理用户到达，返回等待时间"""
         wait_time = 0.0
 
@@ -154,108 +203,135 @@ class WarmPoolSimulator:
         if self.warm_tasks > 0:
             self.warm_tasks -= 1
             self.active_sessions += 1
+            self.user_instance[user_id] = self.instances.take_warm()
             wait_time = self.config.warm_task_assign_time
 
             # 后台补充预热 Task
             self.refill_warm_tasks()
 
-        # 2. EC2 有空闲容量，启动新 Task
-        elif self.available_capacity() > self.pending_tasks:
+        # 2. EC2 有空闲槽位，启动新 Task
+        elif self.instances.free > 0:
             self.pending_tasks += 1
+            self.waiting_users += 1
+            self.user_instance[user_id] = self.instances.place()
             wait_time = self.config.task_startup_time
 
             # 调度 Task 就绪事件
             self.schedule_event(
                 delay=self.config.task_startup_time,
-                event_type='task_ready',
-                data={'user_id': user_id}
+                event_type=EV_TASK_READY,
+                user_id=user_id
             )
 
         # 3. EC2 Warm Pool 有实例，启动
         elif self.ec2_warm_pool > 0:
             self.ec2_warm_pool -= 1
             self.pending_ec2 += 1
+            self.waiting_users += 1
             wait_time = self.config.ec2_warm_start_time
 
             # 调度 EC2 就绪事件
             self.schedule_event(
                 delay=self.config.ec2_warm_start_time,
-                event_type='ec2_ready',
-                data={'user_id': user_id, 'from_warm_pool': True}
+                event_type=EV_EC2_READY,
+                user_id=user_id,
+                arg=True
             )
 
         # 4. 冷启动 EC2
         else:
             self.pending_ec2 += 1
+            self.waiting_users += 1
             wait_time = self.config.ec2_cold_start_time
 
             # 调度 EC2 就绪事件
             self.schedule_event(
                 delay=self.config.ec2_cold_start_time,
-                event_type='ec2_ready',
-                data={'user_id': user_id, 'from_warm_pool': False}
+                event_type=EV_EC2_READY,
+                user_id=user_id,
+                arg=False
             )
 
-        # 调度用户离开事件
-        session_duration = max(60, random.gauss(
-            self.config.session_duration_mean,
-            self.config.session_duration_std
-        ))
+        # 调度用户离开事件（trace 回放时使用真实会话时长）
+        if session_duration is None:
+            session_duration = max(60, self.rng.gauss(
+                self.config.session_duration_mean,
+                self.config.session_duration_std
+            ))
         self.schedule_event(
             delay=wait_time + session_duration,
-            event_type='user_leave',
-            data={'user_id': user_id}
+            event_type=EV_USER_LEAVE,
+            user_id=user_id
         )
 
         # 记录结果
-        self.wait_times.append(wait_time)
-        self.results.append({
-            'time': self.current_time,
-            'user_id': user_id,
-            'wait_time': wait_time,
-            'active_sessions': self.active_sessions,
-            'warm_tasks': self.warm_tasks,
-            'running_ec2': self.running_ec2,
-            'ec2_warm_pool': self.ec2_warm_pool,
-            'utilization': self.utilization(),
-        })
+        self.wait_times.add(wait_time)
 
         return wait_time
 
     def handle_user_leave(self, user_id: int):
-        """处理用户离开"""
-        if self.active_sessions > 0:
-            self.active_sessions -= 1
+        """处理用户离开：释放槽位，所在实例正在排空且已空时停机"""
+        self.active_sessions -= 1
+        if self.instances.release(self.user_instance.pop(user_id)):
+            self.stop_instance()
+        self.check_scale_down()
 
     def handle_task_ready(self, user_id: int):
         """处理 Task 就绪"""
         self.pending_tasks -= 1
+        self.waiting_users -= 1
         self.active_sessions += 1
 
     def handle_ec2_ready(self, user_id: int, from_warm_pool: bool):
-        """处理 EC2 就绪"""
+        """处理 EC2 就绪（主动扩容启动的实例 user_id 为 -1，没有等待的用户）"""
+        self.account_ec2(self.current_time)
         self.pending_ec2 -= 1
         self.running_ec2 += 1
-        self.active_sessions += 1
+        self.last_scaling = self.current_time
+        inst = self.instances.add()
+        if user_id >= 0:
+            self.waiting_users -= 1
+            self.active_sessions += 1
+            self.user_instance[user_id] = self.instances.place(inst)
 
         # EC2 就绪后，补充预热 Task
         self.refill_warm_tasks()
 
     def refill_warm_tasks(self):
         """补充预热 Task 池"""
-        # 计算可用容量
-        total_capacity = self.running_ec2 * self.config.tasks_per_ec2
-        used = self.active_sessions + self.pending_tasks + self.warm_tasks
-
-        # 补充到目标大小
-        to_add = min(
-            self.config.warm_task_pool_size - self.warm_tasks,
-            total_capacity - used
-        )
+        # 补充到目标大小（受可调度实例的空闲槽位限制）
+        to_add = min(self.warm_target - self.warm_tasks, self.instances.free)
 
         if to_add > 0:
             # 简化：假设预热 Task 立即可用（实际需要几秒启动）
             self.warm_tasks += to_add
+            for _ in range(to_add):
+                self.instances.add_warm(self.instances.place())
+
+    def check_scale_down(self):
+        """缩容：利用率低于 scale_down_threshold 且过了冷却期时，排空空闲槽位最多的实例
+
+        排空实例上的预热 Task 立即终止并在其他实例上补充，服务中的会话结束后停机；
+        至少保留 initial_ec2_count 个可调度实例。
+        """
+        config = self.config
+        if (self.current_time - self.last_scaling < config.scale_down_cooldown
+                or len(self.instances.used) <= config.initial_ec2_count
+                or self.utilization() >= config.scale_down_threshold):
+            return
+        _, warm, empty = self.instances.drain()
+        self.warm_tasks -= warm
+        self.last_scaling = self.current_time
+        if empty:
+            self.stop_instance()
+        self.refill_warm_tasks()
+
+    def stop_instance(self):
+        """排空完成的实例停机：EC2 Warm Pool 未满时休眠放回，否则终止"""
+        self.account_ec2(self.current_time)
+        self.running_ec2 -= 1
+        if self.ec2_warm_pool < self.config.ec2_warm_pool_size:
+            self.ec2_warm_pool += 1
 
     def check_proactive_scaling(self):
         """主动扩容检查"""
@@ -269,86 +345,126 @@ class WarmPoolSimulator:
                 self.pending_ec2 += 1
                 self.schedule_event(
                     delay=self.config.ec2_warm_start_time,
-                    event_type='ec2_ready',
-                    data={'user_id': -1, 'from_warm_pool': True}
+                    event_type=EV_EC2_READY,
+                    arg=True
                 )
 
-    def run(self) -> Dict:
-        """运行模拟"""
-        self.reset()
+    def check_predictive_scaling(self):
+        """预测式主动扩容：按预测的到达率提前启动 EC2 并调高预热 Task 目标
+
+        预热 Task 覆盖一次 Task 启动时间内的到达；EC2 容量（含启动中的）覆盖
+        一次 EC2 启动时间内的到达（Warm Pool 有实例时按唤醒时间，用完后按
+        冷启动时间提前冷启动），到达数取高分位估计。
+        """
+        config = self.config
+        now = self.current_time
+        self.warm_target = max(config.warm_task_pool_size, expected_demand(
+            self.forecaster.forecast(now, config.task_startup_time), config.task_startup_time))
+
+        from_warm_pool = self.ec2_warm_pool > 0
+        lead = config.ec2_warm_start_time if from_warm_pool else config.ec2_cold_start_time
+        needed = (self.active_sessions + self.pending_tasks + max(self.warm_tasks, self.warm_target)
+                  + expected_demand(self.forecaster.forecast(now, lead), lead))
+        while (len(self.instances.used) + self.pending_ec2) * config.tasks_per_ec2 < needed:
+            if from_warm_pool:
+                if self.ec2_warm_pool == 0:
+                    break
+                self.ec2_warm_pool -= 1
+            self.pending_ec2 += 1
+            self.schedule_event(
+                delay=lead,
+                event_type=EV_EC2_READY,
+                arg=from_warm_pool
+            )
 
+    def run(self) -> Dict:
+        """运行模拟（状态在构造时已由 reset 初始化）"""
         end_time = self.config.duration_hours * 3600
-        user_id = 0
-
-        # 生成用户到达事件（泊松过程）
-        rate_per_second = self.config.request_rate / 60
-
-        arrival_time = 0
-        while arrival_time < end_time:
-            interval = exponential_random(rate_per_second)
-            arrival_time += interval
-
-            if arrival_time < end_time:
-                self.schedule_event(
-                    delay=arrival_time - self.current_time if self.current_time == 0 else arrival_time,
-                    event_type='user_arrive',
-                    data={'user_id': user_id}
-                )
-                user_id += 1
-
-        # 重新初始化事件队列时间
-        self.current_time = 0
-        new_queue = []
-        for event in self.event_queue:
-            heapq.heappush(new_queue, event)
-        self.event_queue = new_queue
+        self.end_time = end_time
+
+        # 到达按需生成：每个到达事件处理时再调度下一个，事件队列只保存在途事件
+        self.arrival_stream = self.arrivals if self.arrivals is not None else self.poisson_arrivals()
+        self.schedule_next_arrival(end_time)
+        if self.recorder is not None:
+            self.schedule_event(0, EV_TIMELINE_SAMPLE)
+
+        # 分派表：下标为事件类型编码，参数为 (user_id, 参数)
+        handlers = [
+            self.on_user_arrive,
+            self.on_user_leave,
+            self.on_task_ready,
+            self.handle_ec2_ready,
+            self.on_timeline_sample,
+        ]
+        queue = self.event_queue
+        heappop = heapq.heappop
 
         # 处理事件
-        while self.event_queue:
-            event = heapq.heappop(self.event_queue)
-            self.current_time = event.time
-
-            if event.event_type == 'user_arrive':
-                self.handle_user_arrive(event.data['user_id'])
-                self.check_proactive_scaling()
-
-            elif event.event_type == 'user_leave':
-                self.handle_user_leave(event.data['user_id'])
-
-            elif event.event_type == 'task_ready':
-                self.handle_task_ready(event.data['user_id'])
-
-            elif event.event_type == 'ec2_ready':
-                self.handle_ec2_ready(
-                    event.data['user_id'],
-                    event.data.get('from_warm_pool', False)
-                )
+        while queue:
+            self.current_time, _, event_type, user_id, arg = heappop(queue)
+            self.events_processed += 1
+            handlers[event_type](user_id, arg)
 
         return self.analyze_results()
 
+    def on_user_arrive(self, user_id: int, session_duration: Optional[float]):
+        """用户到达事件：分配资源后检查主动扩容"""
+        if self.forecaster is not None:
+            self.forecaster.observe(self.current_time)
+        self.handle_user_arrive(user_id, session_duration)
+        self.check_proactive_scaling()
+        if self.forecaster is not None:
+            self.check_predictive_scaling()
+        self.schedule_next_arrival(self.end_time)
+
+    def on_user_leave(self, user_id: int, _from_warm_pool: bool):
+        """用户离开事件"""
+        self.handle_user_leave(user_id)
+
+    def on_task_ready(self, user_id: int, _from_warm_pool: bool):
+        """Task 就绪事件"""
+        self.handle_task_ready(user_id)
+
+    def on_timeline_sample(self, _user_id: int, _arg):
+        """时间线采样（只读状态，不影响模拟结果）"""
+        self.recorder.sample(
+            self.wait_times,
+            running_ec2=self.running_ec2,
+            warm_tasks=self.warm_tasks,
+            active_tasks=self.active_sessions,
+            pending_tasks=self.pending_tasks,
+            pending_ec2=self.pending_ec2,
+            queue_length=self.waiting_users,
+        )
+        if self.current_time + self.recorder.interval < self.end_time:
+            self.schedule_event(self.recorder.interval, EV_TIMELINE_SAMPLE)
+
     def analyze_results(self) -> Dict:
         """分析模拟结果"""
         if not self.wait_times:
             return {}
 
-        wait_times = sorted(self.wait_times)
-        n = len(wait_times)
+        wait_times = self.wait_times
 
         # 计算统计数据
         stats = {
-            'total_requests': n,
-            'avg_wait': sum(wait_times) / n,
-            'min_wait': min(wait_times),
-            'max_wait': max(wait_times),
-            'p50_wait': wait_times[int(n * 0.5)],
-            'p95_wait': wait_times[min(int(n * 0.95), n - 1)],
-            'p99_wait': wait_times[min(int(n * 0.99), n - 1)],
+            'total_requests': wait_times.count,
+            'avg_wait': wait_times.mean,
+            'min_wait': wait_times.min,
+            'max_wait': wait_times.max,
+            'p50_wait': wait_times.quantile(0.5),
+            'p95_wait': wait_times.quantile(0.95),
+            'p99_wait': wait_times.quantile(0.99),
         }
 
+        # 时间加权的平均运行 EC2
+        self.account_ec2(self.end_time)
+        stats['avg_running_ec2'] = self.ec2_seconds / self.end_time
+
         # 计算等待比例
-        stats['wait_gt_1s'] = sum(1 for w in wait_times if w > 1) / n * 100
-        stats['wait_gt_5s'] = sum(1 for w in wait_times if w > 5) / n * 100
-        stats['wait_gt_20s'] = sum(1 for w in wait_times if w > 20) / n * 100
+        stats['wait_gt_1s'] = wait_times.fraction_above(1) * 100
+        stats['wait_gt_5s'] = wait_times.fraction_above(5) * 100
+        stats['wait_gt_20s'] = wait_times.fraction_above(20) * 100
 
         return stats
 
@@ -385,8 +501,8 @@ def get_strategy_config(strategy: str) -> SimConfig:
     return config
 
 
-def estimate_monthly_cost(config: SimConfig) -> float:
-    """估算月度成本（美元）"""
+def estimate_monthly_cost(config: SimConfig, stats: Dict) -> float:
+    """估算月度成本（美元），按模拟得到的平均运行 EC2（含扩容与缩容）计费"""
     # t3.small: ~$0.02/hour
     ec2_hourly = 0.02
 
@@ -394,7 +510,7 @@ def estimate_monthly_cost(config: SimConfig) -> float:
     hours_per_month = 12 * 30
 
     # Running EC2 成本
-    running_cost = config.initial_ec2_count * ec2_hourly * hours_per_month
+    running_cost = stats['avg_running_ec2'] * ec2_hourly * hours_per_month
 
     # Warm Pool (Stopped) 成本：仅 EBS 存储，约 $0.003/hour
     warm_pool_cost = config.ec2_warm_pool_size * 0.003 * hours_per_month
@@ -402,9 +518,30 @@ def estimate_monthly_cost(config: SimConfig) -> float:
     return running_cost + warm_pool_cost
 
 
+def print_policy_comparison(results: Dict[str, Dict], configs: Dict[str, SimConfig],
+                            strategies: List[str], policy: str):
+    """预测式扩容相对阈值扩容的变化（同一策略、同样的种子）"""
+    print()
+    print("=" * 70)
+    print(f"{policy} 预测扩容 vs 阈值扩容（预测 - 阈值）")
+    print("=" * 70)
+    print()
+    print(f"{'策略':<15} {'平均等待':<10} {'P95':<10} {'P99':<10} {'等待>1s':<10} {'平均EC2':<10} {'月成本':<10}")
+    print("-" * 70)
+    for strategy in strategies:
+        base = results[strategy]
+        name = f"{strategy}+{policy}"
+        predicted = results[name]
+        delta = {key: predicted[key] - base[key] for key in base}
+        cost = estimate_monthly_cost(configs[name], predicted) - estimate_monthly_cost(configs[strategy], base)
+        print(f"{strategy:<15} {delta['avg_wait']:<+10.2f} {delta['p95_wait']:<+10.2f} {delta['p99_wait']:<+10.2f} "
+              f"{delta['wait_gt_1s']:<+9.1f}% {delta['avg_running_ec2']:<+10.2f} ${cost:<+9.1f}")
+    print()
+
+
 def print_results(strategy: str, stats: Dict, config: SimConfig):
     """打印结果"""
-    cost = estimate_monthly_cost(config)
+    cost = estimate_monthly_cost(config, stats)
 
     print(f"\n策略: {strategy}")
     print("-" * 50)
@@ -413,9 +550,12 @@ def print_results(strategy: str, stats: Dict, config: SimConfig):
     print(f"  EC2 Warm Pool: {config.ec2_warm_pool_size}")
     print(f"  预热 Task 池: {config.warm_task_pool_size}")
     print(f"  扩容阈值: {config.scale_up_threshold*100:.0f}%")
+    print(f"  缩容阈值: {config.scale_down_threshold*100:.0f}% (冷却 {config.scale_down_cooldown:.0f}s)")
+    if config.scaling_policy != 'threshold':
+        print(f"  预测扩容: {config.scaling_policy}")
     print()
     print(f"结果:")
-    print(f"  总请求数: {stats['total_requests']}")
+    print(f"  总请求数: {stats['total_requests']:.0f}")
     print(f"  平均等待: {stats['avg_wait']:.2f}s")
     print(f"  P50 等待: {stats['p50_wait']:.2f}s")
     print(f"  P95 等待: {stats['p95_wait']:.2f}s")
@@ -426,11 +566,133 @@ def print_results(strategy: str, stats: Dict, config: SimConfig):
     print(f"  等待>5s:  {stats['wait_gt_5s']:.1f}%")
     print(f"  等待>20s: {stats['wait_gt_20s']:.1f}%")
     print()
+    print(f"  平均运行 EC2: {stats['avg_running_ec2']:.2f}")
     print(f"  预估月成本: ${cost:.0f}")
 
 
-def compare_strategies(duration: float, rate: float):
-    """比较所有策略"""
+def replication_inputs(config: SimConfig, seed: int, trace: Optional[str] = None,
+                       profile: Optional[RateProfile] = None) -> Tuple[Optional[Iterator], RandomStreams]:
+    """一次重复实验的 (到达流, 随机数流)
+
+    trace 为轨迹文件路径时回放真实到达；每次重复各自打开一个流式读取器。
+    profile 给出时按日内曲线生成非齐次泊松到达（request_rate 为峰值），到达用 seed，
+    会话时长用子流 1（与 shared_stream 相同），两者不共用一个比特流。
+    """
+    if trace:
+        return read_trace(trace), RandomStreams(seed)
+    if profile is not None:
+        arrivals = diurnal_arrivals(profile, config.request_rate, config.duration_hours * 3600, seed)
+        return arrivals, RandomStreams(seed, stream=1)
+    return None, RandomStreams(seed)
+
+
+def run_replication(config: SimConfig, seed: int, trace: Optional[str] = None,
+                    profile: Optional[RateProfile] = None) -> Dict:
+    """运行一次重复实验（自带种子，可在子进程中执行）"""
+    arrivals, rng = replication_inputs(config, seed, trace, profile)
+    sim = WarmPoolSimulator(config, arrivals=arrivals, rng=rng)
+    return sim.run()
+
+
+# --profile 计时的方法：事件处理（调用次数即事件数）与其他热点函数
+PROFILE_HANDLERS = ['on_user_arrive', 'on_user_leave', 'on_task_ready', 'handle_ec2_ready']
+PROFILE_FUNCTIONS = [
+    'handle_user_arrive', 'handle_user_leave', 'handle_task_ready', 'refill_warm_tasks',
+    'check_proactive_scaling', 'schedule_next_arrival', 'analyze_results',
+    'check_scale_down', 'stop_instance', 'instances.place', 'instances.release', 'instances.add_warm',
+    'instances.take_warm', 'instances.drain', 'instances.index',
+    'check_predictive_scaling', 'forecaster.observe', 'forecaster.forecast',
+]
+
+
+def profile_replication(config: SimConfig, seed: int, trace: Optional[str] = None,
+                        profile: Optional[RateProfile] = None) -> Dict:
+    """在当前进程中运行一次带计时包装的重复实验，返回剖析报告"""
+    arrivals, rng = replication_inputs(config, seed, trace, profile)
+    sim = WarmPoolSimulator(config, arrivals=arrivals, rng=rng)
+    profiler = Profiler()
+    profiler.instrument(sim, PROFILE_HANDLERS, PROFILE_FUNCTIONS, 'schedule_event', 'event_queue')
+    profiler.run(sim)
+    return profiler.report()
+
+
+def timeline_replication(config: SimConfig, seed: int, interval: float, trace: Optional[str] = None,
+                         profile: Optional[RateProfile] = None) -> Tuple[Dict, Dict]:
+    """运行一次重复实验并按 interval 秒采样时间线，返回 (统计, 时间线各列)
+
+    种子与 run_replication 相同，采样事件只读状态，统计与不导出时一致。
+    """
+    arrivals, rng = replication_inputs(config, seed, trace, profile)
+    recorder = TimelineRecorder(interval)
+    sim = WarmPoolSimulator(config, arrivals=arrivals, rng=rng, recorder=recorder)
+    stats = sim.run()
+    return stats, recorder.finish(sim.wait_times)
+
+
+def export_timelines(configs: Dict[str, SimConfig], runs: int, seed: int, jobs: int, trace: Optional[str],
+                     profile: Optional[RateProfile], interval: float, path: str):
+    """运行全部重复实验并把时间线写成列式文件"""
+    tasks = [(config, seed + i, interval, trace, profile) for config in configs.values() for i in range(runs)]
+    outputs = run_tasks(timeline_replication, tasks, jobs)
+    timelines = {
+        name: [columns for _, columns in outputs[k * runs:(k + 1) * runs]]
+        for k, name in enumerate(configs)
+    }
+    size = write_timelines(path, timelines, interval)
+    samples = len(timelines[next(iter(configs))][0]['running_ec2'])
+    print(f"时间线: {len(configs)} 个策略 × {runs} 次重复 × {samples} 个采样点 → {path} ({size / 1024:.0f} KB)")
+    for k, name in enumerate(configs):
+        stats = average_stats([stats for stats, _ in outputs[k * runs:(k + 1) * runs]])
+        print(f"  {name:<15} 平均等待 {stats['avg_wait']:.2f}s  P95 {stats['p95_wait']:.2f}s")
+
+
+def average_stats(stats_list: List[Dict]) -> Dict:
+    """按 key 平均多次重复实验的统计"""
+    return {
+        key: sum(s[key] for s in stats_list) / len(stats_list)
+        for key in stats_list[0]
+    }
+
+
+# 影响模拟结果的源文件，内容变化后缓存的结果自动失效
+CACHE_SOURCES = [os.path.abspath(__file__)] + [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('sim_arrivals.py', 'sim_forecast.py', 'sim_instances.py', 'sim_random.py', 'sim_stats.py')
+]
+CODE_VERSION = code_version(*CACHE_SOURCES)
+
+
+def run_strategies(configs: Dict[str, SimConfig], runs: int = 1, seed: int = 42,
+                   jobs: int = 1, trace: Optional[str] = None,
+                   profile: Optional[RateProfile] = None,
+                   cache: Optional[ResultCache] = None) -> Dict[str, Dict]:
+    """运行多个策略，每个 (策略, 种子) 重复实验是一个独立任务
+
+    第 i 次重复使用种子 seed + i，并行与串行结果逐位一致。给出 cache 时
+    只计算缓存中没有的重复实验。
+    """
+    tasks = [(config, seed + i, trace, profile) for config in configs.values() for i in range(runs)]
+    if cache is None:
+        outputs = run_tasks(run_replication, tasks, jobs)
+    else:
+        keys = [
+            ResultCache.make_key(
+                simulator='multi-user', version=CODE_VERSION, config=config, seed=seed + i, replication=i,
+                trace=file_identity(trace), profile=profile,
+            )
+            for config in configs.values() for i in range(runs)
+        ]
+        outputs = cache.run(run_replication, tasks, keys, jobs)
+    return {
+        name: average_stats(outputs[k * runs:(k + 1) * runs])
+        for k, name in enumerate(configs)
+    }
+
+
+def compare_strategies(duration: float, rate: float, runs: int = 1, seed: int = 42, jobs: int = 1,
+                       trace: Optional[str] = None, profile: Optional[RateProfile] = None,
+                       cache: Optional[ResultCache] = None, scaling_policy: str = 'threshold'):
+    """比较所有策略；scaling_policy 不是 threshold 时每个策略另跑一个预测扩容版本"""
     strategies = ['conservative', 'aggressive', 'hybrid', 'minimal']
 
     print("=" * 70)
@@ -439,19 +701,32 @@ def compare_strategies(duration: float, rate: float):
     print()
     print(f"模拟参数:")
     print(f"  时长: {duration} 小时")
-    print(f"  请求率: {rate} 个/分钟")
+    if trace:
+        print(f"  请求到达: 回放 {trace}")
+    elif profile is not None:
+        print(f"  请求率: 峰值 {rate} 个/分钟 (日内曲线, 从 {profile.start_hour:g} 点开始)")
+    else:
+        print(f"  请求率: {rate} 个/分钟")
     print(f"  会话时长: 30 分钟 (平均)")
+    print(f"  重复次数: {runs} (种子 {seed} 起)")
     print()
 
-    all_results = {}
-
+    configs = {}
     for strategy in strategies:
         config = get_strategy_config(strategy)
         config.duration_hours = duration
         config.request_rate = rate
+        configs[strategy] = config
+        if scaling_policy != 'threshold':
+            configs[f"{strategy}+{scaling_policy}"] = replace(config, scaling_policy=scaling_policy)
 
-        sim = WarmPoolSimulator(config)
-        stats = sim.run()
+    all_results = {}
+    results = run_strategies(configs, runs, seed, jobs, trace, profile, cache)
+    if cache is not None:
+        print(cache.summary())
+        print()
+    for strategy, stats in results.items():
+        config = configs[strategy]
         all_results[strategy] = (stats, config)
 
         print_results(strategy, stats, config)
@@ -462,21 +737,24 @@ def compare_strategies(duration: float, rate: float):
     print("策略对比表")
     print("=" * 70)
     print()
-    print(f"{'策略':<15} {'平均等待':<10} {'P95':<10} {'P99':<10} {'等待>1s':<10} {'月成本':<10}")
+    width = max(15, max(len(name) + 1 for name in configs))
+    print(f"{'策略':<{width}} {'平均等待':<10} {'P95':<10} {'P99':<10} {'等待>1s':<10} {'月成本':<10}")
     print("-" * 70)
 
-    for strategy in strategies:
+    for strategy in configs:
         stats, config = all_results[strategy]
-        cost = estimate_monthly_cost(config)
-        print(f"{strategy:<15} {stats['avg_wait']:<10.2f} {stats['p95_wait']:<10.2f} {stats['p99_wait']:<10.2f} {stats['wait_gt_1s']:<10.1f}% ${cost:<9.0f}")
+        cost = estimate_monthly_cost(config, stats)
+        print(f"{strategy:<{width}} {stats['avg_wait']:<10.2f} {stats['p95_wait']:<10.2f} {stats['p99_wait']:<10.2f} {stats['wait_gt_1s']:<10.1f}% ${cost:<9.0f}")
 
     print()
     print("=" * 70)
     print()
+    if scaling_policy != 'threshold':
+        print_policy_comparison(results, configs, strategies, scaling_policy)
 
     # 推荐策略
     best = min(strategies, key=lambda s: all_results[s][0]['avg_wait'])
-    cheapest = min(strategies, key=lambda s: estimate_monthly_cost(all_results[s][1]))
+    cheapest = min(strategies, key=lambda s: estimate_monthly_cost(all_results[s][1], all_results[s][0]))
 
     print(f"建议:")
     print(f"  - 最低延迟: {best}")
@@ -520,15 +798,143 @@ def main():
         type=str,
         help="输出 JSON 文件路径"
     )
+    parser.add_argument(
+        "--runs", "-n",
+        type=int,
+        default=1,
+        help="每个策略的重复次数 (默认: 1)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="随机种子，第 i 次重复使用 seed + i (默认: 42)"
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        help="回放真实到达轨迹 (JSONL/CSV，如 daily_report.py --export-trace 的输出)"
+    )
+    parser.add_argument(
+        "--rate-profile",
+        type=str,
+        help="日内到达率曲线: flat / workday 或 24 个逗号分隔的小时系数（--rate 为峰值）"
+    )
+    parser.add_argument(
+        "--start-hour",
+        type=float,
+        default=0.0,
+        help="模拟开始的本地钟点，配合 --rate-profile (默认: 0)"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="并行进程数，0 表示全部 CPU 核 (默认: 1)"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="启用磁盘结果缓存，参数与代码未变的重复实验直接复用"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f"缓存目录 (默认: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        help=f"缓存容量上限 (MB)，超出后按最近访问淘汰 (默认: {DEFAULT_MAX_MB})"
+    )
+    parser.add_argument(
+        "--scaling-policy",
+        choices=SCALING_POLICIES,
+        default='threshold',
+        help="主动扩容策略：threshold 阈值 / ewma、holt-winters 按预测到达率提前扩容；"
+             "配合 --compare 时每个策略同时运行阈值版本并输出对比 (默认: threshold)"
+    )
+    parser.add_argument(
+        "--timeline",
+        type=str,
+        metavar="PATH",
+        help="导出模式：把每次重复的容量时间线写成列式文件 (.npz，或装有 pyarrow 时 .parquet)"
+    )
+    parser.add_argument(
+        "--timeline-interval",
+        type=float,
+        default=60.0,
+        help="时间线采样间隔（秒）(默认: 60)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="剖析模式：运行一次（使用 --seed）并输出各类事件数、各函数耗时、事件堆峰值与峰值 RSS"
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=str,
+        metavar="PATH",
+        help="剖析结果另存为 JSON（配合 --profile）"
+    )
 
     args = parser.parse_args()
 
+    if args.trace and args.rate_profile:
+        parser.error("--trace 与 --rate-profile 不能同时使用")
+    profile = None
+    if args.rate_profile:
+        try:
+            profile = parse_profile(args.rate_profile, args.start_hour)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.profile:
+        strategies = ['conservative', 'aggressive', 'hybrid', 'minimal'] if args.compare else [args.strategy]
+        reports = {}
+        for strategy in strategies:
+            config = get_strategy_config(strategy)
+            config.duration_hours = args.duration
+            config.request_rate = args.rate
+            config.scaling_policy = args.scaling_policy
+            reports[strategy] = profile_replication(config, args.seed, args.trace, profile)
+            print_profile(strategy, reports[strategy])
+        if args.profile_json:
+            with open(args.profile_json, 'w') as f:
+                json.dump(reports, f, indent=2, ensure_ascii=False)
+            print(f"剖析结果已写入 {args.profile_json}")
+        return
+
+    if args.timeline:
+        if not HAS_NUMPY:
+            parser.error("--timeline 需要 numpy (pip install numpy)")
+        strategies = ['conservative', 'aggressive', 'hybrid', 'minimal'] if args.compare else [args.strategy]
+        configs = {}
+        for strategy in strategies:
+            config = get_strategy_config(strategy)
+            config.duration_hours = args.duration
+            config.request_rate = args.rate
+            config.scaling_policy = args.scaling_policy
+            configs[strategy] = config
+        try:
+            export_timelines(configs, args.runs, args.seed, args.jobs, args.trace, profile,
+                             args.timeline_interval, args.timeline)
+        except (ValueError, RuntimeError) as e:
+            parser.error(str(e))
+        return
+
+    cache = ResultCache(args.cache_dir, args.cache_max_mb) if args.cache else None
+
     if args.compare:
-        compare_strategies(args.duration, args.rate)
+        compare_strategies(args.duration, args.rate, args.runs, args.seed, args.jobs, args.trace, profile,
+                           cache, args.scaling_policy)
     else:
         config = get_strategy_config(args.strategy)
         config.duration_hours = args.duration
         config.request_rate = args.rate
+        config.scaling_policy = args.scaling_policy
 
         print("=" * 60)
         print("     多用户并发模拟")
@@ -536,11 +942,18 @@ def main():
         print()
         print(f"策略: {args.strategy}")
         print(f"时长: {args.duration} 小时")
-        print(f"请求率: {args.rate} 个/分钟")
+        if args.trace:
+            print(f"请求到达: 回放 {args.trace}")
+        elif profile is not None:
+            print(f"请求率: 峰值 {args.rate} 个/分钟 ({args.rate_profile} 日内曲线, 从 {args.start_hour:g} 点开始)")
+        else:
+            print(f"请求率: {args.rate} 个/分钟")
         print()
 
-        sim = WarmPoolSimulator(config)
-        stats = sim.run()
+        stats = run_strategies({args.strategy: config}, args.runs, args.seed, args.jobs, args.trace,
+                               profile, cache)[args.strategy]
+        if cache is not None:
+            print(cache.summary())
 
         print_results(args.strategy, stats, config)
 
@@ -555,9 +968,10 @@ def main():
                         'ec2_warm_pool': config.ec2_warm_pool_size,
                         'warm_task_pool': config.warm_task_pool_size,
                         'scale_up_threshold': config.scale_up_threshold,
+                        'scale_down_threshold': config.scale_down_threshold,
                     },
                     'stats': stats,
-                    'monthly_cost': estimate_monthly_cost(config),
+                    'monthly_cost': estimate_monthly_cost(config, stats),
                 }, f, indent=2)
             print(f"\n结果已保存到: {args.output}")
 